@@ -1,21 +1,169 @@
+import os
+import uuid
+from contextlib import contextmanager
 import streamlit as st
-from core.model import generate_response
-from core.memory import init_session, add_message, get_messages, clear_messages, get_api_ready_messages
-from core.processors import build_prompt
+from core.model import stream_response, response_cache
+from core.resilience import GenerationError
+from core.providers import CallScope
+from core.metrics import metrics, ensure_metrics_server
+from core.session_store import get_session_backend
+from core.memory import init_session, add_message, update_message, get_messages, clear_messages
+from core.processors import assemble_messages, system_instruction, TONES, STYLES, FORMATS
+from core.prefix_stats import PrefixTracker
+from core.context import build_context, estimate_tokens
+from core.batch import generate_variants
+from core.prefetch import Speculator
+from core.similarity import similarity_index, HistoryIndexer, request_namespace, SIMILARITY_THRESHOLD, SIMILARITY_WORKSPACE
 from core.templates import get_template_categories, get_templates_in_category, get_template_data, fill_template
-from utils.word_count import count_words, count_chars
-from utils.file_ops import export_chat_as_txt, export_chat_as_md
-from core.image_gen import ImageGenerator
-import base64
+from utils.analytics import ContentAnalytics, FORMAT_LIMITS
+from utils.chat_view import HISTORY_PAGE_SIZE, render_text_history, action_prompt, message_html
+from utils.file_ops import EXPORT_FORMATS, get_cached_export
+from core.blobs import image_store, make_image_ref, make_gallery_ref, parse_image_keys, image_mime
+
+GALLERY_COLUMNS = 4
+
+@st.cache_resource
+def load_css(path):
+    """Reads a stylesheet once per process instead of on every rerun."""
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
 
 # Page Config and Session State
 st.set_page_config(page_title="AI Content Assistant", page_icon="✨", layout="wide")
-with open("assets/styles.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-init_session(st.session_state)
+st.markdown(load_css("assets/styles.css"), unsafe_allow_html=True)
+session_backend = get_session_backend()
+session_id = st.query_params.get("sid")
+if session_backend is not None and not session_id:
+    # The id in the URL lets a reload, restart or another replica reopen this conversation
+    session_id = st.query_params["sid"] = uuid.uuid4().hex
+init_session(st.session_state, session_backend, session_id)
+if "analytics" not in st.session_state: st.session_state.analytics = ContentAnalytics.attach(st.session_state.messages)
+if "session_key" not in st.session_state: st.session_state.session_key = session_id or uuid.uuid4().hex
+ensure_metrics_server()  # Prometheus /metrics endpoint when METRICS_PORT is set
 if "use_template" not in st.session_state: st.session_state.use_template = False
 if "selected_template" not in st.session_state: st.session_state.selected_template = None
 if "template_values" not in st.session_state: st.session_state.template_values = {}
+if "last_stream_stats" not in st.session_state: st.session_state.last_stream_stats = None
+if "history_limit" not in st.session_state: st.session_state.history_limit = HISTORY_PAGE_SIZE
+if "call_scope" not in st.session_state: st.session_state.call_scope = CallScope(st.session_state.session_key)
+if "pending_variants" not in st.session_state: st.session_state.pending_variants = None
+if "pending_reuse" not in st.session_state: st.session_state.pending_reuse = None
+if "expanded_images" not in st.session_state: st.session_state.expanded_images = set()
+if "image_bytes" not in st.session_state: st.session_state.image_bytes = {"sent": 0, "original": 0, "counted": set()}
+if "speculator" not in st.session_state: st.session_state.speculator = Speculator(st.session_state.session_key)
+if "prefix_tracker" not in st.session_state: st.session_state.prefix_tracker = PrefixTracker(st.session_state.session_key, os.getenv("PROMPT_RECORD_PATH"))
+st.session_state.call_scope.cancel_all()  # drop requests left running by an interrupted rerun
+# Whose past prompts may be reused: the deployment's workspace, the signed-in user, or this conversation
+# (each request narrows it further to its writing instruction, see request_namespace)
+reuse_namespace = SIMILARITY_WORKSPACE or (f"user:{st.user.email}" if st.user.get("is_logged_in") else st.session_state.session_key)
+if "history_indexer" not in st.session_state: st.session_state.history_indexer = HistoryIndexer.attach(st.session_state.messages, similarity_index, reuse_namespace)
+
+@contextmanager
+def queue_status():
+    """Shows the session's place in the shared provider queue while a call inside the block is waiting."""
+    note = st.empty()
+    def update(position):
+        if position:
+            note.caption(f"⏳ The assistant is busy - you are #{position} in the queue")
+        else:
+            note.empty()
+    scope = st.session_state.call_scope
+    scope.on_wait = update
+    try:
+        yield
+    finally:
+        scope.on_wait = None
+        note.empty()
+
+def stream_reply(api_messages, use_cache=True, action="chat"):
+    """
+    Renders the model reply as it streams in and returns the final text.
+    Returns None if generation failed; the error is shown after the rerun instead of entering the history.
+    """
+    st.markdown('<div class="assistant-msg"><div class="msg-meta">Assistant</div></div>', unsafe_allow_html=True)
+    st.session_state.prefix_tracker.record(api_messages)
+    stream = stream_response(api_messages, use_cache=use_cache, scope=st.session_state.call_scope, action=action)
+    try:
+        with queue_status():
+            st.write_stream(stream)
+    except GenerationError as e:
+        st.session_state.generation_error = str(e)
+        return None
+    st.session_state.last_stream_stats = stream.stats()
+    return stream.text
+
+def action_messages(action, content):
+    """API messages for a message action (regenerate/expand/shorten) against the current history."""
+    prompt = action_prompt(action, content)
+    clean_history, _ = build_context(st.session_state, reserve_tokens=estimate_tokens(prompt))
+    return assemble_messages(prompt, clean_history)
+
+def render_stored_image(blob_key, kind, widget_key, file_stem):
+    """
+    Shows a stored image as its `kind` rendition, or at full resolution once expanded.
+    The download button serves the original, read only when it is clicked.
+    """
+    from core.renditions import get_rendition
+    expanded = widget_key in st.session_state.expanded_images
+    data = image_store.get(blob_key) if expanded else get_rendition(image_store, blob_key, kind)
+    if data is None:
+        st.warning("This image is no longer available.")
+        return
+    st.image(data, caption="Generated Image", use_container_width=True)
+    counts = st.session_state.image_bytes
+    if (widget_key, expanded) not in counts["counted"]:  # once per image and size, not on every rerun
+        counts["counted"].add((widget_key, expanded))
+        counts["sent"] += len(data)
+        counts["original"] += image_store.size(blob_key) or len(data)
+    mime = image_mime(image_store.peek(blob_key) or b"")
+    download_col, expand_col = st.columns(2)
+    with download_col:
+        st.download_button("📥 Download", lambda: image_store.get(blob_key), file_name=f"{file_stem}.{mime.split('/')[-1]}", mime=mime, key=f"download_{widget_key}", on_click="ignore")
+    with expand_col:
+        if st.button("↩️ Smaller" if expanded else "🔍 Full size", key=f"expand_{widget_key}"):
+            st.session_state.expanded_images ^= {widget_key}
+            st.rerun()
+
+def offer_reuse(prompt, api_messages, action, threshold, namespace):
+    """
+    Looks up past replies to prompts similar to `prompt` within `namespace`. When there are any, the request
+    is parked in `pending_reuse` so the user can take one instantly or generate anyway, and True is returned.
+    """
+    if threshold is None:
+        return False
+    matches = similarity_index.query(namespace, prompt, threshold)
+    if not matches:
+        return False
+    st.session_state.pending_reuse = {"prompt": prompt, "api_messages": api_messages, "action": action, "namespace": namespace,
+                                      "matches": [m._asdict() for m in matches]}
+    return True
+
+def keep_reply(reply, prompt, action, namespace):
+    """
+    Stores a reply and indexes it for reuse under `namespace`. A chat prompt enters the history together
+    with its reply, so a failed or abandoned request never leaves an unanswered user turn (which a retry would send twice).
+    """
+    st.session_state.history_indexer.namespace = namespace
+    if action == "chat":
+        add_message(st.session_state, "user", prompt, msg_type="text")
+    add_message(st.session_state, "assistant", reply, msg_type="text")
+    if action == "template":  # filled templates are not stored as user turns, so they are indexed here
+        similarity_index.add(namespace, prompt, reply)
+
+def run_generation(api_messages, prompt, namespace, variant_count=1, action="chat"):
+    """
+    Streams a single reply and returns it, or, when several variants are requested,
+    samples them concurrently into `pending_variants` (with the `prompt` they answer and the reuse
+    `namespace` to keep the chosen one under) for side-by-side review and returns None.
+    """
+    if variant_count <= 1:
+        return stream_reply(api_messages, action=action)
+    st.session_state.prefix_tracker.record(api_messages)
+    with st.spinner(f"✍️ Writing {variant_count} variants..."), queue_status():
+        results = generate_variants(api_messages, variant_count, scope=st.session_state.call_scope, action=action)
+    st.session_state.pending_variants = {"prompt": prompt, "action": action, "namespace": namespace,
+                                         "variants": [{"text": r.text, "error": r.error} for r in results]}
+    return None
 
 # Sidebar
 with st.sidebar:
@@ -27,11 +175,16 @@ with st.sidebar:
         use_template = st.toggle("Use Prompt Template", value=st.session_state.use_template)
         st.session_state.use_template = use_template
         if not use_template:
-            tone = st.selectbox("Tone",["Default", "Formal", "Casual", "Persuasive", "Humorous"])
-            style = st.selectbox("Style",["Default", "Narrative", "Analytical", "Creative", "Technical", "Academic", "Shakespearean"])
-            format_type = st.selectbox("Format",["Default", "Email", "LinkedIn Post", "Tweet / Thread", "Blog Post", "Journal / Diary Entry", "Story / Fiction", "Summary / Report"])
+            tone = st.selectbox("Tone", TONES)
+            style = st.selectbox("Style", STYLES)
+            format_type = st.selectbox("Format", FORMATS)
         else:
             tone, style, format_type = "Default", "Default", "Default"
+        variant_count = st.slider("Variants per request", 1, 4, 1, help="Generate several versions at once and compare them side by side.")
+        speculate = st.toggle("Prefetch Shorten", value=os.getenv("SPECULATIVE_PREFETCH") == "1", help="Prepare the shortened version of each new reply in the background so Shorten is instant.")
+        speculate_actions = ("shorten", "expand") if speculate and st.checkbox("Also prefetch Expand") else ("shorten",)
+        suggest_reuse = st.toggle("Suggest similar past replies", value=True, help="Before generating, offer the reply to a near-identical earlier prompt for instant reuse.")
+        reuse_threshold = st.slider("Similarity threshold", 0.5, 1.0, SIMILARITY_THRESHOLD, 0.05) if suggest_reuse else None
         if use_template:
             st.markdown("---")
             st.subheader("Prompt Templates")
@@ -53,27 +206,68 @@ with st.sidebar:
             st.session_state.selected_template = None
             st.session_state.template_values = {}
     elif mode == "🎨 Image":
+        # Image modules (and Pillow) are only loaded once image mode is used
+        from core.image_gen import IMAGE_SIZES
         st.subheader("Image Generation Mode")
+        image_count = st.slider("Images per prompt", 1, 8, 1, help="Images are generated in parallel and shown as they arrive.")
+        image_sizes = st.multiselect("Sizes", IMAGE_SIZES, default=[IMAGE_SIZES[0]], help="Requests cycle through the selected sizes.")
+        image_seed = st.number_input("Seed (0 = random)", min_value=0, value=0, step=1, help="Image i uses seed + i, so a set can be reproduced.")
         st.info("💡 Tip: Be descriptive in your prompts for better results!")
         st.markdown("**Examples:**\n- *A futuristic cityscape at sunset*\n- *A Mona Lisa styled portrait of a cat*\n- *A lion sitting on a tree in a dense forest*")
     st.markdown("---")
     st.title("🛠️ Tools")
     if st.button("Word Count"):
-        full_text = " ".join([msg["content"] for msg in st.session_state.messages if msg["role"] == "assistant" and not str(msg.get("content", "")).startswith("IMGB::")])
-        words, chars = count_words(full_text), count_chars(full_text)
-        st.write(f"Words: {words} | Characters: {chars}")
-    txt_data = export_chat_as_txt(st.session_state.messages)
-    st.download_button("Download as TXT", txt_data, "chat_history.txt", "text/plain")
-    md_data = export_chat_as_md(st.session_state.messages)
-    st.download_button("Download as MD", md_data, "chat_history.md", "text/markdown")
+        stats = st.session_state.analytics.summary("assistant")
+        st.write(f"Words: {stats['words']} | Characters: {stats['chars']}")
+        if stats["words"]:
+            st.caption(f"{stats['sentences']} sentences · ~{stats['reading_minutes']:.1f} min read · "
+                       f"reading ease {stats['reading_ease']:.0f} · grade {stats['grade_level']:.1f}")
+            st.caption("Replies within limits: " + " · ".join(
+                f"{name} {stats['fits'][name]}/{stats['messages']}" for name in FORMAT_LIMITS))
+    export_fmt = st.selectbox("Export format", list(EXPORT_FORMATS), format_func=str.upper)
+    # Serialize only on request; the export is cached against the message store version
+    export_key = (export_fmt, st.session_state.messages.version)
+    if st.session_state.get("export_ready") != export_key:
+        if st.button("Prepare download"):
+            st.session_state.export_ready = export_key
+            st.rerun()
+    else:
+        ext, mime = EXPORT_FORMATS[export_fmt]
+        st.download_button(f"Download as {export_fmt.upper()}", get_cached_export(st.session_state, export_fmt), f"chat_history.{ext}", mime)
+    cache_stats = response_cache.stats()
+    st.caption(f"⚡ Response cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits / {cache_stats['misses']} misses")
+    reuse_stats = similarity_index.stats()
+    if reuse_stats["matches"]:
+        st.caption(f"♻️ Similar prompts: {reuse_stats['matches']} offered / {reuse_stats['reused']} reused")
+    latency_rows = metrics.summary()
+    if latency_rows:
+        with st.expander("📈 Latency (p50 / p95)"):
+            fmt = lambda a, b: "-" if a is None else f"{a:.2f}s / {b:.2f}s"
+            st.table([{"action": r["action"], "calls": r["calls"], "errors": r["errors"], "cached": r["cache_hits"],
+                       "queue": fmt(r["queue_p50"], r["queue_p95"]), "first token": fmt(r["ttft_p50"], r["ttft_p95"]),
+                       "total": fmt(r["latency_p50"], r["latency_p95"])} for r in latency_rows])
+    if mode == "📝 Text" and speculate:
+        spec = st.session_state.speculator.stats()
+        st.caption(f"🔮 Prefetch: {spec['hits']} hits / {spec['misses']} misses ({spec['hit_rate']:.0%}), ~{spec['available_tokens']} of {spec['budget_tokens']} tokens available")
     if st.button("Clear Chat"):
         clear_messages(st.session_state)
+        st.session_state.speculator.clear()
+        st.session_state.history_limit = HISTORY_PAGE_SIZE
+        st.session_state.pending_variants = None
+        st.session_state.pending_reuse = None
         st.rerun()
 
 # Main App Layout
 st.title("✨ AI Content Creation Assistant")
 
 if mode == "📝 Text":
+    generation_error = st.session_state.pop("generation_error", None)
+    failed_prompt = st.session_state.pop("failed_prompt", None)
+    if generation_error:
+        st.error(f"⚠️ {generation_error}")
+        if failed_prompt:
+            st.caption("Your message was not saved - copy it to try again:")
+            st.code(failed_prompt, language=None)
     if st.session_state.use_template and st.session_state.selected_template:
         st.markdown("### Template Builder")
         template_data = st.session_state.selected_template["data"]
@@ -115,12 +309,16 @@ if mode == "📝 Text":
                     template_inputs = st.session_state.template_values.copy()
                     ref_post = template_inputs.pop("previous_post_reference", None)
                     filled_template = fill_template(template_data["template"], **template_inputs)
-                    system_msg, user_msg = build_prompt(filled_template, reference_post=ref_post)
-                    clean_history = get_api_ready_messages(st.session_state)
-                    api_messages = [system_msg] + clean_history + [user_msg]
-                    ai_reply = generate_response(api_messages)
-                    add_message(st.session_state, "assistant", ai_reply, msg_type="text")
-                    st.session_state.template_values = {}
+                    clean_history, _ = build_context(st.session_state, reserve_tokens=estimate_tokens(filled_template + (ref_post or "")))
+                    api_messages = assemble_messages(filled_template, clean_history, reference_post=ref_post)
+                    namespace = request_namespace(reuse_namespace, system_instruction(), ref_post)
+                    st.session_state.pending_reuse = None
+                    if not offer_reuse(filled_template, api_messages, "template", reuse_threshold, namespace):
+                        ai_reply = run_generation(api_messages, filled_template, namespace, variant_count, action="template")
+                        if ai_reply is not None:
+                            keep_reply(ai_reply, filled_template, "template", namespace)
+                        if "generation_error" not in st.session_state:  # keep the inputs so a failed request can be retried
+                            st.session_state.template_values = {}
                     st.rerun()
             else:
                 st.info("👆 Fill in all required fields above to generate content from the template.")
@@ -128,80 +326,159 @@ if mode == "📝 Text":
     # Chat History Display
     chat_container = st.container()
     with chat_container:
-        for idx, msg in enumerate(get_messages(st.session_state)):
-            if msg.get("type", "text") != "text": continue
-            ts, role_class = msg.get("timestamp", ""), "user-msg" if msg["role"] == "user" else "assistant-msg"
-            st.markdown(f'<div class="{role_class}"><div class="msg-meta">[{ts}] {msg["role"].capitalize()}</div><div class="msg-content">{msg["content"]}</div></div>', unsafe_allow_html=True)
-            if msg["role"] == "assistant":
-                col1, col2, col3 = st.columns(3)
-                system_msg = build_prompt("")[0]
-                clean_history = get_api_ready_messages(st.session_state)
-                with col1:
-                    if st.button("🔄 Regenerate", key=f"regen_{idx}"):
-                        prompt = f"Regenerate this response:\n\n{msg['content']}"
-                        api_messages = [system_msg] + clean_history + [{"role": "user", "content": prompt}]
-                        new_reply = generate_response(api_messages)
-                        st.session_state.messages[idx]["content"] = new_reply
-                        st.rerun()
-                with col2:
-                    if st.button("➕ Expand", key=f"expand_{idx}"):
-                        prompt = f"Expand this response with more detail:\n\n{msg['content']}"
-                        api_messages = [system_msg] + clean_history + [{"role": "user", "content": prompt}]
-                        new_reply = generate_response(api_messages)
-                        st.session_state.messages[idx]["content"] = new_reply
-                        st.rerun()
-                with col3:
-                    if st.button("➖ Shorten", key=f"shorten_{idx}"):
-                        prompt = f"Shorten this response while keeping meaning clear:\n\n{msg['content']}"
-                        api_messages = [system_msg] + clean_history + [{"role": "user", "content": prompt}]
-                        new_reply = generate_response(api_messages)
-                        st.session_state.messages[idx]["content"] = new_reply
-                        st.rerun()
+        older_slot = st.container()
+        messages = get_messages(st.session_state)
+        hidden, clicked = render_text_history(st, messages, limit=st.session_state.history_limit)
+        hidden += messages.base  # turns of a reopened session that are not loaded yet
+        if hidden:
+            with older_slot:
+                if st.button(f"⬆️ Show older messages ({hidden} hidden)"):
+                    st.session_state.history_limit += HISTORY_PAGE_SIZE
+                    messages.load_older(HISTORY_PAGE_SIZE)
+                    st.rerun()
+        if clicked:
+            # History is only assembled when a button actually fired
+            action, idx = clicked
+            content = messages[idx]["content"]
+            new_reply = st.session_state.speculator.take(idx, action, content) if speculate and action in speculate_actions else None
+            if new_reply is None:
+                new_reply = stream_reply(action_messages(action, content), use_cache=(action != "regen"), action="regenerate" if action == "regen" else action)
+            if new_reply is not None:
+                update_message(st.session_state, idx, new_reply)
+                st.session_state.speculator.invalidate(idx)
+            st.rerun()
+        elif speculate:
+            # Speculate on the newest reply only; results are keyed by its content, so edits never get stale ones
+            last_idx = next((i for i in reversed(messages.indexes("text")) if messages[i].role == "assistant"), None)
+            if last_idx is not None:
+                st.session_state.speculator.speculate(last_idx, messages[last_idx].content, speculate_actions, lambda action: action_messages(action, messages[last_idx].content))
+
+    # Side-by-side variants waiting for the user to pick one
+    pending = st.session_state.pending_variants
+    if pending:
+        st.markdown("#### Pick a variant")
+        variants = pending["variants"]
+        for i, (col, variant) in enumerate(zip(st.columns(len(variants)), variants)):
+            with col:
+                if variant["error"]:
+                    st.error(f"⚠️ Variant {i + 1} failed: {variant['error']}")
+                    continue
+                st.markdown(message_html("assistant", variant["text"]), unsafe_allow_html=True)
+                if st.button("✅ Keep this one", key=f"keep_variant_{i}"):
+                    keep_reply(variant["text"], pending["prompt"], pending["action"], pending["namespace"])
+                    st.session_state.pending_variants = None
+                    st.rerun()
+        if st.button("🗑️ Discard variants"):
+            st.session_state.pending_variants = None
+            st.rerun()
+
+    # A near-identical prompt was answered before: reuse that reply or generate anyway
+    reuse = st.session_state.pending_reuse
+    if reuse:
+        if reuse["action"] == "chat":  # the prompt is not in the history until the user decides
+            st.markdown(message_html("user", reuse["prompt"]), unsafe_allow_html=True)
+        st.markdown("#### ♻️ You asked something similar before")
+        for i, match in enumerate(reuse["matches"]):
+            st.caption(f"{match['score']:.0%} similar: {match['prompt'][:200]}")
+            st.markdown(message_html("assistant", match["response"]), unsafe_allow_html=True)
+            if st.button("♻️ Use this reply", key=f"reuse_{i}"):
+                st.session_state.pending_reuse = None
+                similarity_index.record_reuse()
+                keep_reply(match["response"], reuse["prompt"], reuse["action"], reuse["namespace"])
+                if reuse["action"] == "template":
+                    st.session_state.template_values = {}
+                st.rerun()
+        if st.button("✨ Generate a new reply"):
+            st.session_state.pending_reuse = None
+            ai_reply = run_generation(reuse["api_messages"], reuse["prompt"], reuse["namespace"], variant_count, action=reuse["action"])
+            if ai_reply is not None:
+                keep_reply(ai_reply, reuse["prompt"], reuse["action"], reuse["namespace"])
+            if reuse["action"] == "template" and "generation_error" not in st.session_state:
+                st.session_state.template_values = {}
+            st.rerun()
+
+    stats = st.session_state.last_stream_stats
+    if stats and stats["ttft"] is not None:
+        st.caption(f"⏱️ First token in {stats['ttft']:.2f}s · {stats['tokens_per_sec']:.1f} tokens/s")
+    prefix = st.session_state.prefix_tracker
+    if prefix.requests > 1:
+        st.caption(f"♻️ Prompt prefix reuse: {prefix.last_ratio:.0%} of the last request, {prefix.ratio:.0%} this session")
+    ctx = st.session_state.get("context_stats")
+    if ctx and ctx["dropped_messages"]:
+        st.caption(f"🧠 Context: kept {ctx['kept_tokens']} tokens ({ctx['kept_messages']} turns), summarized {ctx['dropped_tokens']} tokens ({ctx['dropped_messages']} turns)")
 
     # Regular Chat Input
     if not (st.session_state.use_template and st.session_state.selected_template):
         st.markdown("---") 
         user_input = st.chat_input("Type your message for text generation...")
         if user_input:
-            system_msg, user_msg = build_prompt(user_input, tone=tone, style=style, format_type=format_type)
-            add_message(st.session_state, "user", user_input, msg_type="text")
-            clean_history = get_api_ready_messages(st.session_state)
-            api_messages = [system_msg] + clean_history[:-1] + [user_msg]
-            ai_reply = generate_response(api_messages)
-            add_message(st.session_state, "assistant", ai_reply, msg_type="text")
+            st.session_state.pending_reuse = None
+            st.markdown(message_html("user", user_input), unsafe_allow_html=True)
+            clean_history, _ = build_context(st.session_state, reserve_tokens=estimate_tokens(user_input))
+            api_messages = assemble_messages(user_input, clean_history, tone=tone, style=style, format_type=format_type)
+            namespace = request_namespace(reuse_namespace, system_instruction(tone, style, format_type))
+            # The user turn is stored with its reply (see keep_reply), so a walked-away offer or a failure leaves no trace
+            if not offer_reuse(user_input, api_messages, "chat", reuse_threshold, namespace):
+                ai_reply = run_generation(api_messages, user_input, namespace, variant_count)
+                if ai_reply is not None:
+                    keep_reply(ai_reply, user_input, "chat", namespace)
+                elif "generation_error" in st.session_state:
+                    st.session_state.failed_prompt = user_input
             st.rerun()
 
 elif mode == "🎨 Image":
     # Image Mode logic
+    from core.image_gen import ImageGenerator, image_specs
+    from core.renditions import ingest_image, get_rendition
+    image_error = st.session_state.pop("image_error", None)
+    if image_error:
+        st.error(f"⚠️ {image_error}")
     image_chat_container = st.container()
     with image_chat_container:
-        for idx, msg in enumerate(get_messages(st.session_state)):
-            if msg.get("type", "text") != "image": continue
+        image_messages = get_messages(st.session_state)
+        for idx in image_messages.indexes("image"):
+            msg = image_messages[idx]
             ts, role_class = msg.get("timestamp", ""), "user-msg" if msg["role"] == "user" else "assistant-msg"
-            if msg["role"] == "assistant" and str(msg.get("content", "")).startswith("IMGB::"):
-                b64 = str(msg["content"])[6:]
-                try:
-                    img_bytes = base64.b64decode(b64)
-                    st.markdown(f'<div class="{role_class}"><div class="msg-meta">[{ts}] Assistant</div></div>', unsafe_allow_html=True)
-                    st.image(img_bytes, caption="Generated Image", use_container_width=True)
-                    st.download_button("📥 Download Image", img_bytes, file_name=f"generated_{idx}.png", mime="image/png", key=f"download_{idx}")
-                except Exception as e:
-                    st.error(f"Error displaying image: {e}")
+            blob_keys = parse_image_keys(msg["content"]) if msg["role"] == "assistant" else []
+            if blob_keys:
+                st.markdown(f'<div class="{role_class}"><div class="msg-meta">[{ts}] Assistant</div></div>', unsafe_allow_html=True)
+                cols = st.columns(min(len(blob_keys), GALLERY_COLUMNS))
+                # Galleries show thumbnails, single images a compressed display copy
+                kind = "thumb" if len(blob_keys) > 1 else "display"
+                for n, blob_key in enumerate(blob_keys):
+                    with cols[n % len(cols)]:
+                        render_stored_image(blob_key, kind, f"{idx}_{n}", f"generated_{idx}_{n}")
                 continue
             st.markdown(f'<div class="{role_class}"><div class="msg-meta">[{ts}] {msg["role"].capitalize()}</div><div class="msg-content">{msg["content"]}</div></div>', unsafe_allow_html=True)
+    image_counts = st.session_state.image_bytes
+    if image_counts["original"] > image_counts["sent"]:
+        saved = image_counts["original"] - image_counts["sent"]
+        st.caption(f"🖼️ Sent {image_counts['sent'] / 1e6:.1f} MB of images instead of {image_counts['original'] / 1e6:.1f} MB this session ({saved / image_counts['original']:.0%} saved)")
     image_prompt = st.chat_input("Describe the image you want to generate...")
     if image_prompt:
         add_message(st.session_state, "user", image_prompt, msg_type="image")
+        st.markdown(message_html("user", image_prompt), unsafe_allow_html=True)
+        specs = image_specs(image_count, image_sizes, image_seed or None)
+        cols = st.columns(min(len(specs), GALLERY_COLUMNS))
+        slots = [cols[i % len(cols)].empty() for i in range(len(specs))]
+        for slot in slots:
+            slot.info("🎨 Generating...")
+        stored = [[] for _ in specs]
         try:
-            with st.spinner("🎨 Generating your image..."):
-                img_gen = ImageGenerator()
-                results = img_gen.generate(image_prompt)
-            if results:
-                for img_bytes in results:
-                    img_b64 = base64.b64encode(img_bytes).decode("utf-8")
-                    add_message(st.session_state, "assistant", f"IMGB::{img_b64}", msg_type="image")
-            else:
-                add_message(st.session_state, "assistant", "⚠️ Failed to generate image.", msg_type="image")
+            with queue_status():
+                # Each image is shown as soon as it lands; failures are reported in their own slot
+                for result in ImageGenerator().generate_many(image_prompt, specs, scope=st.session_state.call_scope):
+                    if result.ok and result.images:
+                        stored[result.index] = [ingest_image(image_store, img_bytes) for img_bytes in result.images]
+                        slots[result.index].image(get_rendition(image_store, stored[result.index][0], "display"), use_container_width=True)
+                    else:
+                        slots[result.index].error(f"⚠️ Image {result.index + 1} failed: {result.error or 'no image returned'}")
         except Exception as e:
-            add_message(st.session_state, "assistant", f"⚠️ Image generation error: {e}", msg_type="image")
+            st.session_state.image_error = f"Image generation error: {e}"
+        keys = [key for image_keys in stored for key in image_keys]
+        if keys:
+            add_message(st.session_state, "assistant", make_image_ref(keys[0]) if len(keys) == 1 else make_gallery_ref(keys), msg_type="image")
+        failed = sum(not image_keys for image_keys in stored)
+        if failed and "image_error" not in st.session_state:
+            st.session_state.image_error = f"{failed} of {len(specs)} images could not be generated."
         st.rerun()
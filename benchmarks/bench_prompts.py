@@ -0,0 +1,105 @@
+"""
+Equivalence check and micro-benchmark for core.processors.build_prompt.
+
+Compares the precomputed instruction table against the original if/elif
+implementation byte for byte over every tone x style x format combination
+(plus unknown options and reference posts), checks that assemble_messages under
+the default PROMPT_LAYOUT sends exactly the original messages, then times both.
+
+    python -m benchmarks.bench_prompts
+"""
+import itertools
+import sys
+import timeit
+
+from core.processors import FORMATS, PROMPT_LAYOUT, STYLES, TONES, assemble_messages, build_prompt
+
+NUMBER = 20000
+
+
+def legacy_build_prompt(user_input, tone="Default", style="Default", format_type="Default", reference_post=None):
+    """The build_prompt implementation the instruction table replaced, kept as the reference."""
+    instructions = []
+
+    if tone != "Default":
+        instructions.append(f"Use a {tone.lower()} tone.")
+    if style != "Default":
+        instructions.append(f"Follow a {style.lower()} writing style.")
+
+    if format_type != "Default":
+        if format_type.lower() == "email":
+            instructions.append("Write this as a professional email.")
+        elif format_type.lower() == "linkedin post":
+            instructions.append("Write this as a concise, professional LinkedIn post.")
+        elif format_type.lower() == "tweet / thread":
+            instructions.append("Write this as a short, attention-grabbing tweet or thread.")
+        elif format_type.lower() == "blog post":
+            instructions.append("Write this as a detailed, engaging blog post.")
+        elif format_type.lower() == "journal / diary entry":
+            instructions.append("Write this as a personal journal or diary entry.")
+        elif format_type.lower() == "story / fiction":
+            instructions.append("Write this as a creative story or fiction piece.")
+        elif format_type.lower() == "summary / report":
+            instructions.append("Write this as a clear and concise summary or report.")
+        else:
+            instructions.append(f"Format the response as a {format_type.lower()}.")
+
+    system_msg = " ".join(instructions) if instructions else "Respond helpfully to the user."
+
+    if reference_post:
+        final_user_content = f"""
+Your primary task is to respond to the following request: "{user_input}"
+
+---
+**IMPORTANT INSTRUCTION:** You must generate your entire response in a style, tone, and format that is highly similar to the following reference text. Analyze its structure, vocabulary, and sentence length, and emulate it closely.
+
+**REFERENCE TEXT:**
+\"\"\"
+{reference_post}
+\"\"\"
+"""
+    else:
+        final_user_content = user_input
+
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": final_user_content},
+    ]
+
+
+def check_equivalence():
+    tones = TONES + ["Sarcastic", "FORMAL"]
+    styles = STYLES + ["Minimalist"]
+    formats = FORMATS + ["Haiku", "EMAIL", "Press Release"]
+    references = [None, "", "My last post: {braces} stay literal.\nSecond line."]
+    inputs = ["Write about {topic}", 'Quote "this"', ""]
+    history = [{"role": "user", "content": "Earlier prompt"}, {"role": "assistant", "content": "Earlier reply"}]
+    checked = 0
+    for tone, style, format_type, ref, text in itertools.product(tones, styles, formats, references, inputs):
+        new = build_prompt(text, tone=tone, style=style, format_type=format_type, reference_post=ref)
+        old = legacy_build_prompt(text, tone=tone, style=style, format_type=format_type, reference_post=ref)
+        if new != old:
+            print(f"MISMATCH for tone={tone!r} style={style!r} format={format_type!r} ref={ref!r}")
+            return False
+        assembled = assemble_messages(text, history, tone=tone, style=style, format_type=format_type, reference_post=ref)
+        if assembled != [old[0]] + history + [old[1]]:
+            print(f"MISMATCH in assemble_messages ({PROMPT_LAYOUT} layout) for tone={tone!r} style={style!r} "
+                  f"format={format_type!r} ref={ref!r}")
+            return False
+        checked += 1
+    print(f"equivalence: {checked} combinations identical, including assemble_messages ({PROMPT_LAYOUT} layout)")
+    return True
+
+
+def main():
+    if not check_equivalence():
+        return 1
+    args = ("Write a product launch post", "Persuasive", "Technical", "LinkedIn Post")
+    for label, fn in (("legacy", legacy_build_prompt), ("table", build_prompt)):
+        best = min(timeit.repeat(lambda: fn(*args), number=NUMBER, repeat=3))
+        print(f"{label:>7}: {best / NUMBER * 1e6:.2f} us per build_prompt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
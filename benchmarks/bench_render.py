@@ -0,0 +1,86 @@
+"""
+Render-loop benchmark for the text chat history.
+
+Renders sessions of 10, 100 and 1,000 turns through utils.chat_view against a
+recording stand-in for Streamlit and checks that the per-turn cost stays flat
+(linear total cost). Run from the repo root:
+
+    python -m benchmarks.bench_render
+"""
+import sys
+import time
+
+from core.memory import MessageStore
+from utils.chat_view import render_text_history
+
+SESSION_SIZES = (10, 100, 1000)
+REPEATS = 5
+# Per-turn cost at the largest size may be at most this many times the smallest
+MAX_PER_TURN_RATIO = 3.0
+
+
+class _Column:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingStreamlit:
+    """Minimal stand-in for the Streamlit calls the history renderer makes."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.calls += 1
+
+    def columns(self, n):
+        self.calls += 1
+        return [_Column() for _ in range(n)]
+
+    def button(self, label, key=None):
+        self.calls += 1
+        return False
+
+
+def make_session(turns):
+    messages = MessageStore()
+    for i in range(turns):
+        messages.append("user", f"Question {i} " * 20)
+        messages.append("assistant", f"Answer {i} " * 80)
+    return messages
+
+
+def time_render(messages, limit):
+    best = float("inf")
+    for _ in range(REPEATS):
+        fake = RecordingStreamlit()
+        start = time.perf_counter()
+        render_text_history(fake, messages, limit=limit)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = []
+    for turns in SESSION_SIZES:
+        messages = make_session(turns)
+        full = time_render(messages, limit=None)
+        windowed = time_render(messages, limit=20)
+        rows.append((turns, full, windowed))
+        print(f"{turns:>5} turns | full render {full * 1000:8.2f} ms ({full / turns * 1e6:6.1f} us/turn)"
+              f" | windowed {windowed * 1000:6.2f} ms")
+
+    ratio = (rows[-1][1] / rows[-1][0]) / (rows[0][1] / rows[0][0])
+    print(f"per-turn cost ratio {SESSION_SIZES[-1]} vs {SESSION_SIZES[0]} turns: {ratio:.2f}")
+    if ratio > MAX_PER_TURN_RATIO:
+        print("FAIL: render cost grows faster than linearly")
+        return 1
+    print("OK: render cost grows linearly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
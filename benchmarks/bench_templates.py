@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: compiled template fill versus the previous str.format-based fill_template.
+
+    python -m benchmarks.bench_templates
+"""
+import timeit
+
+from core.templates import compile_template, fill_template, get_registry
+
+NUMBER = 20000
+
+
+def legacy_fill_template(template_text, **kwargs):
+    """The fill_template implementation this module replaced, kept here as the baseline."""
+    try:
+        valid_kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        return template_text.format(**valid_kwargs)
+    except KeyError as e:
+        return f"Error: Missing value for {e}"
+
+
+def main():
+    registry = get_registry()
+    cases = []
+    for category in registry.categories():
+        for name, data in registry.in_category(category).items():
+            values = {field: f"sample {field}" for field in registry.compiled(category, name).fields}
+            values["previous_post_reference"] = None
+            cases.append((data["template"], values))
+
+    for template, values in cases:
+        assert fill_template(template, **values) == legacy_fill_template(template, **values)
+
+    def run_legacy():
+        for template, values in cases:
+            legacy_fill_template(template, **values)
+
+    def run_current():
+        for template, values in cases:
+            fill_template(template, **values)
+
+    def run_compiled():
+        for template, values in cases:
+            compile_template(template).fill(values)
+
+    per_fill = NUMBER * len(cases)
+    results = {}
+    for label, fn in (("legacy str.format", run_legacy), ("fill_template", run_current), ("compiled .fill", run_compiled)):
+        best = min(timeit.repeat(fn, number=NUMBER, repeat=3))
+        results[label] = best / per_fill * 1e6
+        print(f"{label:>18}: {results[label]:.2f} us per fill")
+    print(f"compiled fill is {results['legacy str.format'] / results['compiled .fill']:.1f}x faster than the old fill_template")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Offline load test for the async provider layer.
+
+Starts the mock Groq/Cloudflare server, fires concurrent chat, streaming and image
+requests through core.providers and checks that the semaphores bound concurrency,
+that deadlines fire and that cancelled calls stop. Run from the repo root:
+
+    python -m benchmarks.load_test --requests 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.mock_server import MockConfig, MockProviderServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = MockProviderServer(config=MockConfig(latency=args.latency, token_delay=0.002, tokens=20)).start()
+    os.environ.update({
+        "GROQ_API_KEY": "mock",
+        "GROQ_BASE_URL": server.url,
+        "CLOUDFLARE_API_BASE": f"{server.url}/client/v4",
+        "CLOUDFLARE_API_TOKEN": "mock",
+        "CLOUDFLARE_ACCOUNT_ID": "mock",
+    })
+    # Imported after the environment points at the mock server
+    from core import providers
+    from core.image_gen import ImageGenerator
+    from core.model import MODEL, MAX_TOKENS, TEMPERATURE
+
+    messages = [{"role": "user", "content": "Write a haiku"}]
+    failures = []
+
+    start = time.perf_counter()
+    futures = [providers.submit(providers.chat_completion(messages, MODEL, TEMPERATURE, MAX_TOKENS))
+               for _ in range(args.requests)]
+    replies = [fut.result() for fut in futures]
+    chat_wall = time.perf_counter() - start
+    serial = args.requests * args.latency
+    print(f"chat: {len(replies)} requests in {chat_wall:.2f}s (serial would be ~{serial:.2f}s), "
+          f"peak in flight {server.stats.peak_in_flight['chat']} / limit {providers.GROQ_MAX_CONCURRENCY}")
+    if server.stats.peak_in_flight["chat"] > providers.GROQ_MAX_CONCURRENCY:
+        failures.append("chat concurrency exceeded the semaphore limit")
+
+    start = time.perf_counter()
+    deltas = list(providers.iter_sync(providers.stream_chat(messages, MODEL, TEMPERATURE, MAX_TOKENS)))
+    print(f"stream: {len(deltas)} chunks in {time.perf_counter() - start:.2f}s")
+
+    gen = ImageGenerator()
+    start = time.perf_counter()
+    futures = [providers.submit(gen.agenerate("a red apple", 512, 512)) for _ in range(args.requests)]
+    images = [fut.result() for fut in futures]
+    print(f"image: {len(images)} requests in {time.perf_counter() - start:.2f}s, "
+          f"peak in flight {server.stats.peak_in_flight['image']} / limit {providers.CLOUDFLARE_MAX_CONCURRENCY}")
+    if server.stats.peak_in_flight["image"] > providers.CLOUDFLARE_MAX_CONCURRENCY:
+        failures.append("image concurrency exceeded the semaphore limit")
+
+    try:
+        providers.run_sync(providers.chat_completion(messages, MODEL, TEMPERATURE, MAX_TOKENS, deadline=args.latency / 4))
+        failures.append("deadline did not fire")
+    except asyncio.TimeoutError:
+        print("deadline: call exceeding its deadline was aborted")
+
+    scope = providers.CallScope()
+    for _ in range(4):
+        providers.submit(providers.chat_completion(messages, MODEL, TEMPERATURE, MAX_TOKENS), scope)
+    time.sleep(args.latency / 4)
+    print(f"cancel: {scope.cancel_all()} in-flight calls cancelled on rerun")
+
+    server.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Local mock of the Groq chat completions and Cloudflare Workers AI endpoints.
+
+Lets the provider layer be load-tested offline. Run standalone with
+
+    python -m benchmarks.mock_server --port 8765 --latency 0.5
+
+then point the app at it:
+
+    GROQ_BASE_URL=http://127.0.0.1:8765 CLOUDFLARE_API_BASE=http://127.0.0.1:8765/client/v4
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Smallest valid PNG (1x1 transparent pixel)
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+class MockConfig:
+    """
+    Tunable behaviour of the mock endpoints.
+    Failure injection: a chat request fails with `fail_status` (and a Retry-After header when
+    `retry_after` is set) if its model is in `fail_models` or with probability `fail_rate`
+    (seeded, so runs are repeatable). `model_latency` overrides `latency` per model.
+    """
+
+    def __init__(self, latency=0.05, token_delay=0.005, tokens=40, image_bytes=0, image_latency=None,
+                 fail_rate=0.0, fail_status=429, retry_after=None, fail_models=(), model_latency=None, seed=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.image_bytes = image_bytes
+        self.image_latency = latency if image_latency is None else image_latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.fail_models = set(fail_models)
+        self.model_latency = dict(model_latency or {})
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def should_fail(self, model):
+        if model in self.fail_models:
+            return True
+        with self._rng_lock:
+            return self.fail_rate > 0 and self.rng.random() < self.fail_rate
+
+
+class MockStats:
+    """Request counters, including the peak number of concurrent requests per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {"chat": 0, "image": 0}
+        self.in_flight = {"chat": 0, "image": 0}
+        self.peak_in_flight = {"chat": 0, "image": 0}
+        self.disconnects = 0
+        self.by_model = {}  # chat requests per model
+        self.failures_injected = 0
+
+    def enter(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+            self.in_flight[kind] += 1
+            self.peak_in_flight[kind] = max(self.peak_in_flight[kind], self.in_flight[kind])
+
+    def leave(self, kind):
+        with self._lock:
+            self.in_flight[kind] -= 1
+
+
+def _reply_text(tokens):
+    return " ".join(f"word{i}" for i in range(tokens))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockProvider/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            self._run("chat", self._chat, body)
+        elif "/ai/run/" in self.path:
+            self._run("image", self._image, body)
+        else:
+            self._json(404, {"error": f"unknown path {self.path}"})
+
+    def _run(self, kind, handler, body):
+        stats = self.server.stats
+        stats.enter(kind)
+        try:
+            handler(body)
+        except (BrokenPipeError, ConnectionResetError):
+            stats.disconnects += 1
+        finally:
+            stats.leave(kind)
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chat(self, body):
+        cfg = self.server.config
+        stats = self.server.stats
+        model = body.get("model", "mock")
+        with stats._lock:
+            stats.by_model[model] = stats.by_model.get(model, 0) + 1
+        time.sleep(cfg.model_latency.get(model, cfg.latency))
+        if cfg.should_fail(model):
+            with stats._lock:
+                stats.failures_injected += 1
+            headers = {"Retry-After": str(cfg.retry_after)} if cfg.retry_after is not None else {}
+            self._json(cfg.fail_status, {"error": {"message": "injected failure", "type": "mock_error"}}, headers)
+            return
+        words = _reply_text(min(cfg.tokens, body.get("max_tokens") or cfg.tokens)).split(" ")
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+        usage = {"prompt_tokens": 10, "completion_tokens": len(words), "total_tokens": 10 + len(words)}
+        if not body.get("stream"):
+            self._json(200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, word in enumerate(words):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(cfg.token_delay)
+        final = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"id": "mock", "usage": usage}}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _image(self, body):
+        cfg = self.server.config
+        time.sleep(cfg.image_latency)
+        image = TINY_PNG + b"\0" * cfg.image_bytes
+        self._json(200, {"success": True, "result": {"image": base64.b64encode(image).decode("ascii")}})
+
+
+class MockProviderServer:
+    """Threaded mock server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.config = config or MockConfig()
+        self._httpd.stats = MockStats()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def config(self):
+        return self._httpd.config
+
+    @property
+    def stats(self):
+        return self._httpd.stats
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per reply")
+    parser.add_argument("--image-bytes", type=int, default=0, help="padding added to each image")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of chat requests that fail")
+    parser.add_argument("--fail-status", type=int, default=429, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with failures")
+    parser.add_argument("--fail-model", action="append", default=[], help="model whose requests always fail")
+    args = parser.parse_args()
+    config = MockConfig(args.latency, args.token_delay, args.tokens, args.image_bytes,
+                        fail_rate=args.fail_rate, fail_status=args.fail_status,
+                        retry_after=args.retry_after, fail_models=args.fail_model)
+    server = MockProviderServer(port=args.port, config=config)
+    print(f"Mock Groq/Cloudflare server on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Offline prefix-reuse report.
+
+Replays recorded requests (JSONL written by core.prefix_stats.PrefixTracker when the app
+runs with PROMPT_RECORD_PATH set) and reports, per session and overall, which fraction of
+each request repeats the previous request's prefix:
+
+    python -m benchmarks.prefix_reuse recorded_requests.jsonl
+
+With --simulate, synthetic sessions (changing tone/style/format every few turns, with
+occasional Expand/Shorten clicks) are assembled under both prompt layouts for comparison:
+
+    python -m benchmarks.prefix_reuse --simulate --turns 60
+"""
+import argparse
+import json
+import random
+import sys
+from collections import OrderedDict
+
+from core.context import build_context
+from core.memory import MessageStore
+from core.prefix_stats import PrefixTracker
+from core.processors import FORMATS, STYLES, TONES, assemble_messages
+
+
+class _Session(dict):
+    """Attribute-style dict standing in for st.session_state."""
+
+    __getattr__ = dict.__getitem__
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def replay(paths):
+    trackers = OrderedDict()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                session = record.get("session", "")
+                tracker = trackers.get(session)
+                if tracker is None:
+                    tracker = trackers[session] = PrefixTracker(session)
+                tracker.record(record["messages"])
+    return trackers
+
+
+def simulate(layout, turns, seed):
+    rng = random.Random(seed)
+    ss = _Session(messages=MessageStore())
+    tracker = PrefixTracker(layout)
+    tone, style, format_type = "Default", "Default", "Default"
+    for turn in range(turns):
+        if turn % 4 == 0:
+            tone, style, format_type = rng.choice(TONES), rng.choice(STYLES), rng.choice(FORMATS)
+        user_input = f"Turn {turn}: write about topic {rng.randint(0, 999)}. " * rng.randint(1, 4)
+        ss.messages.append("user", user_input)
+        history, _ = build_context(ss, budget=1500)
+        tracker.record(assemble_messages(user_input, history[:-1], tone, style, format_type, layout=layout))
+        reply = f"Reply {turn}. " + "Lorem ipsum dolor sit amet. " * rng.randint(5, 20)
+        ss.messages.append("assistant", reply)
+        if rng.random() < 0.25:
+            prompt = f"Shorten this response while keeping meaning clear:\n\n{reply}"
+            history, _ = build_context(ss, budget=1500)
+            tracker.record(assemble_messages(prompt, history, layout=layout))
+    return tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="recorded request JSONL files")
+    parser.add_argument("--simulate", action="store_true", help="compare layouts on synthetic sessions")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.paths:
+        trackers = replay(args.paths)
+        reused = total = 0
+        for session, tracker in trackers.items():
+            print(f"session {session or '-':>10}: {tracker.requests:4d} requests, reused-prefix ratio {tracker.ratio:.1%}")
+            reused += tracker.reused_chars
+            total += tracker.total_chars
+        print(f"overall reused-prefix ratio: {reused / total if total else 0.0:.1%}")
+    if args.simulate:
+        for layout in ("classic", "stable"):
+            tracker = simulate(layout, args.turns, args.seed)
+            print(f"simulated {layout:>7} layout: {tracker.requests} requests, reused-prefix ratio {tracker.ratio:.1%}")
+    if not args.paths and not args.simulate:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
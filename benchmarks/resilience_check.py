@@ -0,0 +1,124 @@
+"""
+Failure-injection check for the retry / circuit breaker / fallback engine.
+
+Runs core.resilience against the mock Groq server with injected 429s, 503s, 400s and
+a slow primary model, and checks that
+  - rate-limited requests are retried (honouring Retry-After, ignoring a malformed one) and succeed,
+  - a failing primary opens its breaker and traffic moves to the fallback model,
+  - non-retryable errors surface as GenerationError after a single attempt,
+  - streams that fail before the first token are retried,
+  - a primary over the latency SLO is routed around.
+
+    python -m benchmarks.resilience_check
+"""
+import os
+import sys
+import time
+
+from benchmarks.mock_server import MockConfig, MockProviderServer
+
+PRIMARY = "mock-large"
+FALLBACK = "mock-small"
+MODELS = [PRIMARY, FALLBACK]
+MESSAGES = [{"role": "user", "content": "Write a haiku"}]
+
+
+def main():
+    server = MockProviderServer(config=MockConfig(latency=0.01, token_delay=0.001, tokens=10)).start()
+    os.environ.update({"GROQ_API_KEY": "mock", "GROQ_BASE_URL": server.url})
+    # Imported after the environment points at the mock server
+    from core import providers, resilience
+
+    resilience.BACKOFF_BASE = 0.01
+    resilience.BREAKER_RESET_SECONDS = 60.0
+    cfg, stats = server.config, server.stats
+    failures = []
+
+    def complete(route=None):
+        return providers.run_sync(resilience.complete(MESSAGES, MODELS, 0.7, 64, route=route))
+
+    def reset(**changes):
+        resilience.reset_breakers()
+        cfg.fail_rate, cfg.fail_models, cfg.retry_after, cfg.fail_status, cfg.model_latency = 0.0, set(), None, 429, {}
+        for name, value in changes.items():
+            setattr(cfg, name, value)
+        stats.by_model.clear()
+        stats.failures_injected = 0
+
+    # 1. Transient 429s with Retry-After
+    reset(fail_rate=0.4, retry_after=0.05)
+    start = time.perf_counter()
+    routes = []
+    for _ in range(20):
+        route = resilience.Route()
+        complete(route)
+        routes.append(route)
+    attempts = sum(r.attempts for r in routes)
+    print(f"429s: 20/20 succeeded in {time.perf_counter() - start:.2f}s, {stats.failures_injected} injected failures, "
+          f"{attempts} attempts, {sum(r.model == FALLBACK for r in routes)} served by fallback")
+    if attempts != 20 + stats.failures_injected:
+        failures.append("every injected 429 should cost exactly one extra attempt")
+
+    # 1b. A Retry-After that is neither seconds nor an HTTP date falls back to the usual backoff
+    reset(fail_rate=0.4, retry_after="soon")
+    try:
+        for _ in range(10):
+            complete()
+        print(f"429s: malformed Retry-After ignored, {stats.failures_injected} injected failures retried")
+    except Exception as e:
+        failures.append(f"a malformed Retry-After should not escape as {type(e).__name__}")
+
+    # 2. Primary down: breaker opens, fallback serves
+    reset(fail_models={PRIMARY}, fail_status=503)
+    served = [None] * 12
+    for i in range(12):
+        route = resilience.Route()
+        complete(route)
+        served[i] = route.model
+    primary_calls = stats.by_model.get(PRIMARY, 0)
+    print(f"503s: primary called {primary_calls}x, breaker open={resilience.breaker(PRIMARY).is_open}, "
+          f"all served by {set(served)}")
+    if set(served) != {FALLBACK} or primary_calls != resilience.BREAKER_FAILURES:
+        failures.append("breaker should open after BREAKER_FAILURES and route everything to the fallback")
+
+    # 3. Non-retryable error
+    reset(fail_models={PRIMARY}, fail_status=400)
+    try:
+        complete()
+        failures.append("400 should raise GenerationError")
+    except resilience.GenerationError as e:
+        print(f"400: GenerationError after {stats.by_model.get(PRIMARY, 0)} attempt(s): {e}")
+        if stats.by_model.get(PRIMARY, 0) != 1 or stats.by_model.get(FALLBACK, 0):
+            failures.append("400 should not be retried or fall back")
+
+    # 4. Stream failing before the first token
+    reset(fail_rate=0.5, retry_after=0.01)
+    route = resilience.Route()
+    chunks = list(providers.iter_sync(resilience.stream(MESSAGES, MODELS, 0.7, 64, route=route)))
+    text = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    print(f"stream: {len(text.split())} words from {route.model} after {route.attempts} attempt(s)")
+    if len(text.split()) != cfg.tokens:
+        failures.append("stream should deliver the full reply")
+
+    # 5. Primary over the latency SLO
+    reset(model_latency={PRIMARY: 0.3})
+    resilience.LATENCY_SLO_SECONDS = 0.1
+    served = []
+    for _ in range(5):
+        route = resilience.Route()
+        complete(route)
+        served.append(route.model)
+    print(f"slo: served by {served}")
+    if served[0] != PRIMARY or set(served[1:]) != {FALLBACK}:
+        failures.append("a primary over the SLO should be routed around")
+
+    server.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
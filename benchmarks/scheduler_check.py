@@ -0,0 +1,103 @@
+"""
+Checks for the process-wide provider scheduler (core.scheduler).
+
+Drives a ProviderScheduler on the provider loop with simulated calls and checks
+  - round-robin fairness: a light session is not stuck behind a heavy one,
+  - interactive calls are admitted before queued bulk work,
+  - the requests-per-minute bucket paces admissions,
+  - queue positions reported to a waiting session are correct.
+
+    python -m benchmarks.scheduler_check
+"""
+import asyncio
+import sys
+import time
+
+from core import providers, scheduler
+
+WORK_SECONDS = 0.01
+
+
+async def _call(sched, order, label, tokens=0):
+    async with sched.slot(tokens):
+        order.append(label)
+        await asyncio.sleep(WORK_SECONDS)
+
+
+def _spawn(sched, order, label, session, priority=scheduler.INTERACTIVE):
+    return providers.submit(_call(sched, order, label), providers.CallScope(session, priority))
+
+
+def check_fairness(failures):
+    sched = scheduler.ProviderScheduler("test", max_concurrency=1)
+    order = []
+    futures = [_spawn(sched, order, f"heavy{i}", "heavy") for i in range(10)]
+    time.sleep(WORK_SECONDS / 2)
+    futures += [_spawn(sched, order, f"light{i}", "light") for i in range(2)]
+    for fut in futures:
+        fut.result()
+    light_done = max(order.index("light0"), order.index("light1")) + 1
+    print(f"fairness: light session's 2 calls done after {light_done} of {len(order)} admissions")
+    if light_done > 5:
+        failures.append("light session waited behind the heavy session's backlog")
+
+
+def check_priority(failures):
+    sched = scheduler.ProviderScheduler("test", max_concurrency=1)
+    order = []
+    futures = [_spawn(sched, order, f"bulk{i}", "batch", scheduler.BULK) for i in range(6)]
+    time.sleep(WORK_SECONDS / 2)
+    futures.append(_spawn(sched, order, "chat", "user"))
+    for fut in futures:
+        fut.result()
+    print(f"priority: interactive call admitted at position {order.index('chat') + 1} behind queued bulk work")
+    if order.index("chat") > 2:
+        failures.append("interactive call was not admitted ahead of bulk work")
+
+
+def check_rate(failures):
+    per_minute = 600  # 10/s, burst of 100
+    sched = scheduler.ProviderScheduler("test", max_concurrency=50, requests_per_minute=per_minute)
+    order = []
+    total = 130
+    start = time.perf_counter()
+    futures = [_spawn(sched, order, i, f"s{i % 5}") for i in range(total)]
+    for fut in futures:
+        fut.result()
+    elapsed = time.perf_counter() - start
+    expected = (total - sched.request_bucket.capacity) / sched.request_bucket.rate
+    print(f"rate: {total} calls at {per_minute}/min took {elapsed:.2f}s (burst then ~{expected:.1f}s of pacing)")
+    if elapsed < expected * 0.8:
+        failures.append("requests-per-minute bucket did not pace admissions")
+
+
+def check_position(failures):
+    sched = scheduler.ProviderScheduler("test", max_concurrency=1)
+    order = []
+    futures = [_spawn(sched, order, f"a{i}", "a") for i in range(3)]
+    time.sleep(WORK_SECONDS / 2)
+    futures.append(_spawn(sched, order, "b0", "b"))
+    time.sleep(WORK_SECONDS / 4)
+    position = sched.position("b")
+    print(f"position: session b is #{position} in the queue, {sched.waiting()} waiting")
+    if position != 2:
+        failures.append(f"expected session b at position 2, got {position}")
+    for fut in futures:
+        fut.result()
+
+
+def main():
+    failures = []
+    check_fairness(failures)
+    check_priority(failures)
+    check_rate(failures)
+    check_position(failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Checks for the near-duplicate prompt index (core.similarity).
+
+  - a template prompt with one placeholder changed is found above the default threshold,
+  - unrelated prompts, other sessions' prompts and prompts sent with another writing instruction are not,
+  - the history indexer indexes new pairs under the namespace they were sent with, not loaded ones,
+  - the index never holds more than max_entries and keeps its LSH buckets in step,
+  - a SQLite-backed index is reloaded intact by a new instance, with lookups refreshing the on-disk LRU order,
+  - lookup time stays flat as the index fills up.
+
+    python -m benchmarks.similarity_check
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from core.memory import MessageStore
+from core.processors import system_instruction
+from core.similarity import SIMILARITY_THRESHOLD, HistoryIndexer, SimilarityIndex, request_namespace
+
+TEMPLATE = ("Write a LinkedIn post announcing {product}, our new project management tool for remote teams. "
+            "Highlight real-time collaboration, automated reporting and the free 30-day trial. Keep it upbeat.")
+
+
+def distinct_prompt(i):
+    """A prompt sharing almost no shingles with distinct_prompt(j) for j != i."""
+    rng = random.Random(i)
+    return " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(6)) for _ in range(12))
+
+
+def check_matching(failures):
+    index = SimilarityIndex()
+    index.add("s1", TEMPLATE.format(product="TaskFlow"), "reply about TaskFlow")
+    index.add("s1", "Summarize the quarterly sales figures for the board in three bullet points.", "sales reply")
+    matches = index.query("s1", TEMPLATE.format(product="TeamBoard"))
+    score = matches[0].score if matches else 0.0
+    print(f"matching: one placeholder changed -> {score:.2f} similar (threshold {SIMILARITY_THRESHOLD})")
+    if not matches or matches[0].response != "reply about TaskFlow":
+        failures.append("near-identical template prompt was not matched")
+    if index.query("s1", "Draft a polite email declining a meeting invitation for next Tuesday."):
+        failures.append("unrelated prompt was matched")
+    if index.query("s2", TEMPLATE.format(product="TeamBoard")):
+        failures.append("another session's prompt was matched")
+
+
+def check_history(failures):
+    index = SimilarityIndex()
+    store = MessageStore()
+    store.append("user", TEMPLATE.format(product="Loaded"))
+    store.append("assistant", "reply written before the indexer was attached")
+    email = request_namespace("s", system_instruction(format_type="Email"))
+    tweet = request_namespace("s", system_instruction(format_type="Tweet / Thread"))
+    indexer = HistoryIndexer.attach(store, index, email)
+    store.append("user", TEMPLATE.format(product="TaskFlow"))
+    store.append("assistant", "email about TaskFlow")
+    indexer.namespace = tweet
+    store.update(3, "revised email about TaskFlow")
+    as_email = index.query(email, TEMPLATE.format(product="TeamBoard"))
+    as_tweet = index.query(tweet, TEMPLATE.format(product="TeamBoard"))
+    print(f"history: {len(index)} indexed, {len(as_email)} email / {len(as_tweet)} tweet matches")
+    if len(index) != 1:
+        failures.append("loaded history was indexed without the settings it was sent with")
+    if not as_email or as_email[0].response != "revised email about TaskFlow":
+        failures.append("an edited reply was not re-indexed under its original namespace")
+    if as_tweet:
+        failures.append("a reply was offered for a prompt sent with another format")
+    if request_namespace("s", system_instruction(), "post A") == request_namespace("s", system_instruction(), "post B"):
+        failures.append("requests with different reference posts share a namespace")
+
+
+def check_bounds(failures):
+    index = SimilarityIndex(max_entries=50)
+    for i in range(500):
+        index.add("s", f"Prompt number {i}: write about topic {i * 7919} in a friendly tone.", f"reply {i}")
+    bucketed = set().union(*index._buckets.values())
+    print(f"bounds: {len(index)} entries after 500 adds (max 50), {len(index._buckets)} buckets")
+    if len(index) > 50 or bucketed != set(index._entries):
+        failures.append("index exceeded max_entries or kept stale bucket entries")
+
+
+def check_persistence(failures):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "similar.db")
+        index = SimilarityIndex(max_entries=10, db_path=path)
+        for i in range(20):
+            index.add("s", distinct_prompt(i), f"reply {i}")
+        index._db.close()
+        reopened = SimilarityIndex(max_entries=10, db_path=path)
+        matches = reopened.query("s", distinct_prompt(19))
+        print(f"persistence: {len(reopened)} entries reloaded, best match {matches[0].response if matches else None!r}")
+        if len(reopened) != 10 or not matches or matches[0].response != "reply 19":
+            failures.append("reloaded index lost entries or signatures")
+        # A hit on the oldest entry must protect it from the next eviction, on disk as in memory
+        reopened.query("s", distinct_prompt(10))
+        reopened.add("s", distinct_prompt(20), "reply 20")
+        reopened._db.close()
+        again = SimilarityIndex(max_entries=10, db_path=path)
+        kept = again.query("s", distinct_prompt(10))
+        print(f"persistence: recently matched entry {'kept' if kept else 'evicted'} across a reload")
+        if not kept or kept[0].response != "reply 10":
+            failures.append("a lookup did not refresh the entry's on-disk LRU position")
+        again._db.close()
+
+
+def check_lookup_time(failures):
+    index = SimilarityIndex(max_entries=5000)
+    timings = []
+    for size in (100, 5000):
+        while len(index) < size:
+            n = len(index)
+            index.add("s", f"Entry {n}: notes on subject {n * 104729} for audience {n % 13}.", "reply")
+        start = time.perf_counter()
+        for i in range(50):
+            index.query("s", TEMPLATE.format(product=f"Lookup{i}"))
+        timings.append((time.perf_counter() - start) / 50 * 1000)
+    print(f"lookup: {timings[0]:.2f} ms at 100 entries, {timings[1]:.2f} ms at 5000 entries")
+    if timings[1] > timings[0] * 5:
+        failures.append("lookup time grows with the index size")
+
+
+def main():
+    failures = []
+    check_matching(failures)
+    check_history(failures)
+    check_bounds(failures)
+    check_persistence(failures)
+    check_lookup_time(failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
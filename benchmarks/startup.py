@@ -0,0 +1,97 @@
+"""
+Cold-start and per-rerun overhead of the Streamlit app.
+
+  - import: a fresh interpreter imports every module app.py imports at the top level
+    (streamlit itself excluded - the server has loaded it before the script first runs);
+    reports the median wall time and which heavy modules were pulled in,
+  - rerun: runs app.py under streamlit.testing's AppTest, timing the first (cold) run of
+    the script and the median of later reruns with no user input.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --imports 10 --reruns 50
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+# Modules that only some paths need; a cold start should not load them
+HEAVY_MODULES = ("groq", "httpx", "PIL.Image", "core.image_gen", "core.renditions")
+
+_IMPORT_PROBE = """
+import json, sys, time
+modules = {modules!r}
+start = time.perf_counter()
+for name in modules:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def app_imports():
+    """Top-level modules imported by app.py, in order."""
+    with open(APP, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return [n for n in dict.fromkeys(names) if n.split(".")[0] != "streamlit"]
+
+
+def measure_imports(runs):
+    probe = _IMPORT_PROBE.format(modules=app_imports(), heavy=HEAVY_MODULES)
+    samples, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(samples), loaded
+
+
+def measure_reruns(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    start = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception)
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    return first, statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imports", type=int, default=5, help="fresh interpreters to time the imports in")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns to time after the first run")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    seconds, loaded = measure_imports(args.imports)
+    print(f"import: {seconds * 1000:8.1f} ms median over {args.imports} fresh interpreters; "
+          f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+    first, rerun = measure_reruns(args.reruns)
+    print(f" rerun: {first * 1000:8.1f} ms first run, {rerun * 1000:8.1f} ms median over {args.reruns} reruns")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Offline benchmark suite.
+
+Drives the real code paths (context building, prompt assembly, streaming through
+core.providers, history rendering, template fills, exports, Word Count analytics, image generation and
+blob storage) against the deterministic mock Groq/Cloudflare server, and reports
+throughput, latency percentiles and peak Python memory (tracemalloc) per scenario:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --latency 0.05 --tokens 200 --image-bytes 500000
+
+Save a baseline on the machine that will run the comparison (e.g. the CI runner),
+then compare later runs against it; the exit status is 1 when a scenario regressed:
+
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.bench_render import RecordingStreamlit, make_session
+from benchmarks.mock_server import MockConfig, MockProviderServer
+
+# Metrics where a larger value is a regression
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "peak_kib")
+
+
+class _Session(dict):
+    """Attribute-style dict standing in for st.session_state."""
+
+    __getattr__ = dict.__getitem__
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def scenario_chat_turns(args):
+    """One chat turn per op: context, prompt assembly, a streamed reply from the mock server, history update."""
+    from core.context import build_context
+    from core.memory import MessageStore, add_message
+    from core.model import stream_response
+    from core.processors import assemble_messages
+
+    ss = _Session(messages=MessageStore())
+
+    def op(i):
+        user_input = f"Turn {i}: write a short post about topic {i}. " * 3
+        add_message(ss, "user", user_input)
+        history, _ = build_context(ss)
+        stream = stream_response(assemble_messages(user_input, history[:-1], "Friendly", "Default", "Default"),
+                                 use_cache=False, action="benchmark")
+        for _ in stream:
+            pass
+        add_message(ss, "assistant", stream.text)
+
+    return op, args.turns
+
+
+def scenario_long_history(args):
+    """One full and one windowed render of a long session per op."""
+    from utils.chat_view import HISTORY_PAGE_SIZE, render_text_history
+
+    messages = make_session(args.history)
+
+    def op(i):
+        render_text_history(RecordingStreamlit(), messages, limit=None)
+        render_text_history(RecordingStreamlit(), messages, limit=HISTORY_PAGE_SIZE)
+
+    return op, 20
+
+
+def scenario_template_fills(args):
+    """Fills every registered template once per op."""
+    from core.templates import fill_template, get_registry
+
+    registry = get_registry()
+    cases = []
+    for category in registry.categories():
+        for name, data in registry.in_category(category).items():
+            values = {field: f"sample {field}" for field in registry.compiled(category, name).fields}
+            cases.append((data["template"], values))
+
+    def op(i):
+        for template, values in cases:
+            fill_template(template, **values)
+
+    return op, 2000
+
+
+def scenario_exports(args):
+    """Serializes a long session in every export format per op (uncached)."""
+    from utils.file_ops import EXPORT_FORMATS, export_chat
+
+    messages = make_session(args.history)
+
+    def op(i):
+        for fmt in EXPORT_FORMATS:
+            export_chat(messages, fmt)
+
+    return op, 10
+
+
+def scenario_word_count(args):
+    """One new reply plus a Word Count query per op, on top of a long session's running analytics."""
+    from core.memory import MessageStore
+    from utils.analytics import ContentAnalytics
+
+    store = MessageStore()
+    for msg in make_session(args.history):
+        store.append(msg["role"], msg["content"], msg.get("type", "text"))
+    analytics = ContentAnalytics.attach(store)
+
+    def op(i):
+        store.append("assistant", f"Reply {i}. A short paragraph about topic {i}, written for a busy reader.")
+        analytics.summary("assistant")
+
+    return op, 2000
+
+
+def scenario_image_mode(args):
+    """One image request per op: mock Cloudflare call, base64 decode, ingest with renditions, thumbnail read."""
+    from core.blobs import BlobStore, make_image_ref, parse_image_ref
+    from core.image_gen import ImageGenerator
+    from core.renditions import get_rendition, ingest_image
+
+    generator = ImageGenerator()
+    store = BlobStore(spill_dir=None)
+
+    def op(i):
+        for image in generator.generate(f"a red apple, variation {i}", 512, 512):
+            ref = make_image_ref(ingest_image(store, image))
+            get_rendition(store, parse_image_ref(ref), "thumb")
+
+    return op, args.images
+
+
+SCENARIOS = {
+    "chat_turns": scenario_chat_turns,
+    "long_history_render": scenario_long_history,
+    "template_fills": scenario_template_fills,
+    "exports": scenario_exports,
+    "word_count": scenario_word_count,
+    "image_mode": scenario_image_mode,
+}
+
+
+def run_scenario(factory, args):
+    """Times every op, then repeats the run under tracemalloc for the peak memory figure."""
+    op, count = factory(args)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - t)
+    wall = time.perf_counter() - start
+
+    op, count = factory(args)
+    tracemalloc.start()
+    try:
+        for i in range(count):
+            op(i)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops": count,
+        "ops_per_sec": count / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns a message for every metric more than `tolerance` (a fraction) worse than the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]:.2f} -> {current[metric]:.2f}")
+        if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: ops_per_sec {previous['ops_per_sec']:.1f} -> {current['ops_per_sec']:.1f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", choices=list(SCENARIOS), help="run a subset of scenarios")
+    parser.add_argument("--latency", type=float, default=0.01, help="mock seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0005, help="mock seconds between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=80, help="tokens per mock reply")
+    parser.add_argument("--image-bytes", type=int, default=200_000, help="size of each mock image")
+    parser.add_argument("--turns", type=int, default=40, help="chat turns to run")
+    parser.add_argument("--history", type=int, default=1000, help="turns in the long-history session")
+    parser.add_argument("--images", type=int, default=20, help="image requests to run")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="flag regressions against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(latency=args.latency, token_delay=args.token_delay, tokens=args.tokens, image_bytes=args.image_bytes)
+    server = MockProviderServer(config=config).start()
+    os.environ.update({
+        "GROQ_API_KEY": "mock",
+        "GROQ_BASE_URL": server.url,
+        "CLOUDFLARE_API_BASE": f"{server.url}/client/v4",
+        "CLOUDFLARE_API_TOKEN": "mock",
+        "CLOUDFLARE_ACCOUNT_ID": "mock",
+    })
+    results = {}
+    try:
+        for name in args.only or SCENARIOS:
+            results[name] = result = run_scenario(SCENARIOS[name], args)
+            print(f"{name:>20} | {result['ops']:5d} ops {result['ops_per_sec']:9.1f} ops/s | "
+                  f"p50 {result['p50_ms']:8.2f} ms p95 {result['p95_ms']:8.2f} ms p99 {result['p99_ms']:8.2f} ms | "
+                  f"peak {result['peak_kib']:9.1f} KiB")
+    finally:
+        server.stop()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"OK: no regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Headless bulk generation: read jobs from JSONL, write results as JSONL.
+
+Each input line is one job, e.g.
+
+    {"id": "sku-1", "category": "Marketing & Business", "template": "Product Description",
+     "values": {"product_name": "...", "key_features": "...", "target_audience": "..."},
+     "tone": "Persuasive", "style": "Default", "format": "Default"}
+
+A job may give a free-form "prompt" instead of category/template/values. Each output line
+has the job id, its input line number and either "text" or "error".
+
+Input is streamed one line at a time. Progress is checkpointed next to the output file,
+so re-running the same command after an interruption resumes where it stopped.
+
+    python bulk_generate.py jobs.jsonl results.jsonl --concurrency 8 --rate 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from core import providers, scheduler
+from core.batch import RateLimiter, agenerate_job
+from core.templates import get_template_data
+
+
+class Checkpoint:
+    """
+    Tracks finished input lines compactly: every line below `watermark` is done,
+    plus the few finished lines above it that are still waiting on slower neighbours.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.watermark = 0
+        self.done_above = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.watermark = state["watermark"]
+            self.done_above = set(state["done_above"])
+
+    def is_done(self, line_no):
+        return line_no < self.watermark or line_no in self.done_above
+
+    def mark(self, line_no):
+        self.done_above.add(line_no)
+        while self.watermark in self.done_above:
+            self.done_above.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "done_above": sorted(self.done_above)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def to_batch_job(spec):
+    """Maps an input line to a core.batch job, resolving category/template names to template text."""
+    if "prompt" in spec:
+        job = {"prompt": spec["prompt"]}
+    else:
+        template_data = get_template_data(spec.get("category"), spec.get("template"))
+        if not template_data:
+            raise ValueError(f"Unknown template {spec.get('category')!r} / {spec.get('template')!r}")
+        values = dict(spec.get("values", {}))
+        job = {"template": template_data["template"], "values": values,
+               "reference_post": values.pop("previous_post_reference", None) or None}
+    job["tone"] = spec.get("tone", "Default")
+    job["style"] = spec.get("style", "Default")
+    job["format_type"] = spec.get("format", spec.get("format_type", "Default"))
+    if spec.get("reference_post"):
+        job["reference_post"] = spec["reference_post"]
+    return job
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+async def run(input_path, output_path, concurrency, rate_per_minute, use_cache, checkpoint_path):
+    checkpoint = Checkpoint(checkpoint_path)
+    limiter = RateLimiter(rate_per_minute) if rate_per_minute else None
+    latencies = []
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    with open(input_path, encoding="utf-8") as src, open(output_path, "a", encoding="utf-8") as out:
+        def pending_jobs():
+            for line_no, line in enumerate(src):
+                if checkpoint.is_done(line_no):
+                    counts["skipped"] += 1
+                    continue
+                if line.strip():
+                    yield line_no, line
+                else:
+                    checkpoint.mark(line_no)
+
+        jobs = pending_jobs()
+
+        def record(line_no, payload):
+            out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            out.flush()
+            checkpoint.mark(line_no)
+            checkpoint.save()
+
+        async def worker():
+            # Workers pull from one shared line iterator, so at most `concurrency` jobs are in memory
+            for line_no, line in jobs:
+                try:
+                    spec = json.loads(line)
+                    job = to_batch_job(spec)
+                except (ValueError, KeyError, TypeError) as e:
+                    counts["error"] += 1
+                    record(line_no, {"line": line_no, "error": f"Invalid job: {e}"})
+                    continue
+                if limiter is not None:
+                    await limiter.wait()
+                result = await agenerate_job(line_no, job, use_cache=use_cache, action="bulk")
+                payload = {"id": spec.get("id", line_no), "line": line_no}
+                if result.ok:
+                    counts["ok"] += 1
+                    latencies.append(result.latency)
+                    payload["text"] = result.text
+                else:
+                    counts["error"] += 1
+                    payload["error"] = result.error
+                payload["latency"] = round(result.latency, 3)
+                record(line_no, payload)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    processed = counts["ok"] + counts["error"]
+    return {
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "jobs_per_s": round(processed / elapsed, 2) if elapsed else 0.0,
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "latency_max_s": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one job per line")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs in flight at once")
+    parser.add_argument("--rate", type=float, default=None, help="maximum requests started per minute")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <output>.ckpt)")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model, even for repeated jobs")
+    args = parser.parse_args(argv)
+
+    summary = providers.run_sync(run(
+        args.input, args.output, args.concurrency, args.rate,
+        not args.no_cache, args.checkpoint or f"{args.output}.ckpt",
+    ), providers.CallScope("bulk", priority=scheduler.BULK))
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Loaded once per process, before any core module reads its settings from the environment
+load_dotenv()
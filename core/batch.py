@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from core import providers, resilience, scheduler
+from core.model import MODEL, MODELS, TEMPERATURE, MAX_TOKENS, response_cache
+from core.cache import make_cache_key
+from core.metrics import metrics
+from core.processors import build_prompt
+from core.templates import compile_template
+
+DEFAULT_PARALLELISM = 4
+
+
+class BatchResult:
+    """Outcome of one batch item: `text` on success, `error` otherwise."""
+
+    __slots__ = ("index", "text", "error", "latency")
+
+    def __init__(self, index: int, text: Optional[str] = None, error: Optional[str] = None, latency: float = 0.0):
+        self.index = index
+        self.text = text
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class RateLimiter:
+    """Spaces request starts evenly so no more than `per_minute` begin in any minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def build_job_messages(job: dict, history: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Turns a job into API messages.
+    A job has either a "prompt" or a "template" plus "values", and may set
+    "tone", "style", "format_type" and "reference_post" like build_prompt.
+    Template values are validated up front; TemplateFieldError lists every missing or extra field.
+    """
+    if "template" in job:
+        template = compile_template(job["template"])
+        values = job.get("values", {})
+        template.validate(values)
+        user_input = template.fill(values)
+    else:
+        user_input = job["prompt"]
+    system_msg, user_msg = build_prompt(
+        user_input,
+        tone=job.get("tone", "Default"),
+        style=job.get("style", "Default"),
+        format_type=job.get("format_type", "Default"),
+        reference_post=job.get("reference_post"),
+    )
+    return [system_msg] + list(history or []) + [user_msg]
+
+
+async def agenerate_one(index: int, messages: List[dict], use_cache: bool = True, action: str = "batch") -> BatchResult:
+    """Runs a single batch item with retries and fallback; a final failure is captured on the result rather than raised."""
+    key = make_cache_key(MODEL, messages, TEMPERATURE, MAX_TOKENS)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            metrics.record_cache_hit(MODEL, action)
+            return BatchResult(index, text=cached)
+    start = time.perf_counter()
+    route = resilience.Route()
+    try:
+        text = await resilience.complete(messages, MODELS, TEMPERATURE, MAX_TOKENS, action=action, route=route)
+    except resilience.GenerationError as e:
+        return BatchResult(index, error=str(e), latency=time.perf_counter() - start)
+    if route.model == MODEL:
+        response_cache.put(key, text)
+    return BatchResult(index, text=text, latency=time.perf_counter() - start)
+
+
+async def agenerate_job(index: int, job: dict, history: Optional[List[dict]] = None, use_cache: bool = True,
+                        action: str = "batch") -> BatchResult:
+    """Builds and runs one job; an invalid job (e.g. missing template values) fails only its own result."""
+    try:
+        messages = build_job_messages(job, history)
+    except (ValueError, KeyError, TypeError) as e:  # TemplateFieldError is a ValueError
+        return BatchResult(index, error=f"Invalid job: {e}")
+    return await agenerate_one(index, messages, use_cache, action)
+
+
+async def _run_limited(items: list, run, parallelism: int, rate_per_minute: Optional[float]) -> List[BatchResult]:
+    limit = asyncio.Semaphore(max(1, parallelism))
+    limiter = RateLimiter(rate_per_minute) if rate_per_minute else None
+
+    async def run_one(index, item):
+        async with limit:
+            if limiter is not None:
+                await limiter.wait()
+            return await run(index, item)
+
+    return list(await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items))))
+
+
+async def arun_batch(message_lists: List[List[dict]], parallelism: int = DEFAULT_PARALLELISM,
+                     rate_per_minute: Optional[float] = None, use_cache: bool = True,
+                     action: str = "batch") -> List[BatchResult]:
+    """
+    Runs one chat completion per message list, at most `parallelism` at a time.
+    Results come back in input order; a failing item records its error instead of raising.
+    """
+    return await _run_limited(message_lists, lambda i, m: agenerate_one(i, m, use_cache, action), parallelism, rate_per_minute)
+
+
+async def arun_jobs(jobs: List[dict], history: Optional[List[dict]] = None, parallelism: int = DEFAULT_PARALLELISM,
+                    rate_per_minute: Optional[float] = None, use_cache: bool = True,
+                    action: str = "batch") -> List[BatchResult]:
+    """Like arun_batch, but each job's messages are built inside its own task, so a bad job cannot sink the batch."""
+    return await _run_limited(jobs, lambda i, job: agenerate_job(i, job, history, use_cache, action), parallelism, rate_per_minute)
+
+
+def generate_batch(jobs: List[dict], history: Optional[List[dict]] = None, parallelism: int = DEFAULT_PARALLELISM,
+                   rate_per_minute: Optional[float] = None, scope: Optional[providers.CallScope] = None) -> List[BatchResult]:
+    """
+    Generates one reply per job concurrently; see build_job_messages for the job format.
+    Batch calls queue at bulk priority, behind interactive chat. An invalid job comes back
+    as a failed result at its index.
+    """
+    batch = arun_jobs(jobs, history, parallelism, rate_per_minute)
+    return providers.run_sync(scheduler.run_as(batch, priority=scheduler.BULK), scope)
+
+
+def generate_variants(messages: List[dict], n: int, parallelism: int = DEFAULT_PARALLELISM,
+                      scope: Optional[providers.CallScope] = None, action: str = "chat") -> List[BatchResult]:
+    """Samples `n` independent replies to the same request. The cache is bypassed so each variant differs."""
+    response_cache.record_bypass()
+    return providers.run_sync(arun_batch([messages] * n, parallelism, use_cache=False, action=action), scope)
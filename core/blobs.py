@@ -0,0 +1,169 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from core.session_store import get_session_backend
+
+IMAGE_REF_PREFIX = "IMGREF::"
+GALLERY_REF_PREFIX = "IMGSET::"
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_SPILL_DIR = os.path.join(tempfile.gettempdir(), "content-assistant-blobs")
+
+
+def make_image_ref(key: str) -> str:
+    """Returns the small message payload that points at a stored image."""
+    return f"{IMAGE_REF_PREFIX}{key}"
+
+
+def parse_image_ref(content: str) -> Optional[str]:
+    """Returns the blob key of an image reference, or None for ordinary text."""
+    if isinstance(content, str) and content.startswith(IMAGE_REF_PREFIX):
+        return content[len(IMAGE_REF_PREFIX):]
+    return None
+
+
+def make_gallery_ref(keys: List[str]) -> str:
+    """Returns the message payload for a group of stored images shown together."""
+    return f"{GALLERY_REF_PREFIX}{','.join(keys)}"
+
+
+def parse_image_keys(content: str) -> List[str]:
+    """Returns the blob keys of an image or gallery reference, or [] for ordinary text."""
+    if isinstance(content, str) and content.startswith(GALLERY_REF_PREFIX):
+        return [key for key in content[len(GALLERY_REF_PREFIX):].split(",") if key]
+    key = parse_image_ref(content)
+    return [key] if key else []
+
+
+def image_mime(data: bytes) -> str:
+    """Guesses the MIME type of raw image bytes from their signature."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class BlobStore:
+    """
+    Content-addressed store for binary blobs such as generated images.
+    Blobs are keyed by SHA-256 and kept in an in-memory LRU bounded by total bytes;
+    entries evicted from memory are spilled to `spill_dir` and read back on demand.
+    With a `durable` store (a session backend), every blob is also written through to it and
+    read back from it when neither memory nor the spill directory has it, e.g. after a
+    restart or on another replica.
+    """
+
+    def __init__(self, max_memory_bytes: int = DEFAULT_MEMORY_BYTES, spill_dir: Optional[str] = DEFAULT_SPILL_DIR,
+                 durable: Any = None):
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir
+        self.durable = durable
+        self._lru = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.disk_reads = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def put(self, data: bytes, key: Optional[str] = None) -> str:
+        """
+        Stores `data` and returns its key. Storing the same bytes twice is a no-op.
+        An explicit `key` is used for derived blobs (e.g. renditions) named after their source.
+        """
+        key = key or hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return key
+            self._remember(key, data)
+        if self.durable is not None:
+            self.durable.put_blob(key, data)
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the stored bytes object itself (no copy), or None if the blob is unknown."""
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                return data
+            path = self._path(key)
+            if path is not None and os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+        if data is None and self.durable is not None:
+            data = self.durable.get_blob(key)
+        if data is None:
+            return None
+        with self._lock:
+            self.disk_reads += 1
+            if key not in self._lru:
+                self._remember(key, data)
+        return data
+
+    def size(self, key: str) -> Optional[int]:
+        """Size of a blob in bytes without loading it from disk, or None if unknown."""
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                return len(data)
+            path = self._path(key)
+            if path is not None and os.path.exists(path):
+                return os.path.getsize(path)
+        data = self.get(key) if self.durable is not None else None
+        return None if data is None else len(data)
+
+    def peek(self, key: str, n: int = 16) -> Optional[bytes]:
+        """First `n` bytes of a blob (enough for image_mime) without loading it from disk."""
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                return data[:n]
+            path = self._path(key)
+            if path is not None and os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read(n)
+        data = self.get(key) if self.durable is not None else None
+        return None if data is None else data[:n]
+
+    def stats(self) -> dict:
+        return {
+            "memory_blobs": len(self._lru),
+            "memory_bytes": self._memory_bytes,
+            "spilled": self.spilled,
+            "disk_reads": self.disk_reads,
+        }
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.spill_dir, key) if self.spill_dir else None
+
+    def _remember(self, key: str, data: bytes):
+        self._lru[key] = data
+        self._memory_bytes += len(data)
+        # Always keep the newest blob in memory, even if it alone exceeds the limit
+        while self._memory_bytes > self.max_memory_bytes and len(self._lru) > 1:
+            old_key, old_data = self._lru.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            self._spill(old_key, old_data)
+
+    def _spill(self, key: str, data: bytes):
+        path = self._path(key)
+        if path is None or os.path.exists(path):
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.spilled += 1
+
+
+# Set IMAGE_BLOB_DIR to choose where images evicted from memory are kept; with SESSION_DB_PATH set,
+# images are also stored next to the session log so reopened sessions can show them
+image_store = BlobStore(spill_dir=os.getenv("IMAGE_BLOB_DIR", DEFAULT_SPILL_DIR), durable=get_session_backend())
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+def make_cache_key(model: str, messages: List[dict], temperature: float, max_tokens: int) -> str:
+    """
+    Content-addressed key for a completion request.
+    Message text is trimmed and its line endings unified so trivially different payloads share
+    an entry; inner whitespace is kept, since line structure (lists, code, verse) changes the reply.
+    """
+    normalized = {
+        "model": model,
+        "messages": [{"role": m["role"], "content": str(m["content"]).replace("\r\n", "\n").strip()} for m in messages],
+        "temperature": round(float(temperature), 3),
+        "max_tokens": int(max_tokens),
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for model responses.
+    An in-process LRU sits in front of an optional SQLite file with TTL and size-based eviction.
+    """
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 ttl_seconds: int = 7 * 24 * 3600, max_disk_entries: int = 5000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+            if self._db is not None:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT value FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """Stores a response in both tiers, evicting the least recently used entries."""
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def record_bypass(self):
+        """Counts a request that deliberately skipped the cache (e.g. Regenerate)."""
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        """Drops every entry from both tiers."""
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for both tiers."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._lru),
+        }
+
+    def _remember(self, key: str, value: str):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
@@ -0,0 +1,114 @@
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CONTEXT_TOKEN_BUDGET = 6000
+SUMMARY_TOKEN_BUDGET = 300
+# Older turns are dropped in blocks of this many messages, so the summarized prefix
+# (and with it the provider-side prompt cache) stays unchanged for several turns
+DROP_GRANULARITY = 8
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_message_tokens(msg) -> int:
+    """
+    Returns the token count of a stored message, computing it at most once.
+    The count is cached on the message together with the content it was computed for,
+    so an edited message (e.g. after Regenerate) is recounted automatically.
+    """
+    content = msg["content"]
+    cached = msg.get("_tokens")
+    if cached is not None and cached[0] is content:
+        return cached[1]
+    tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    msg["_tokens"] = (content, tokens)
+    return tokens
+
+
+def fingerprint(messages: List[dict]) -> str:
+    """Digest of the roles and contents of `messages`; any edit inside the range changes it."""
+    digest = hashlib.blake2b(digest_size=16)
+    for msg in messages:
+        digest.update(f"{msg['role']}\0{msg['content']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def extractive_summary(messages: List[dict], max_tokens: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """
+    Folds older turns into a short summary without calling the model:
+    keeps the first sentence of each turn, oldest first, until the budget is used up.
+    """
+    lines = []
+    used = 0
+    for msg in messages:
+        first = msg["content"].strip().split("\n", 1)[0]
+        first = first.split(". ", 1)[0][:200]
+        line = f"- {msg['role'].capitalize()}: {first}"
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+
+def build_context(
+    ss: Any,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    reserve_tokens: int = 0,
+    summarizer: Optional[Callable[[List[dict]], str]] = None,
+) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Assembles API-ready history that fits within `budget` tokens.
+    The newest text turns are kept verbatim; anything older is folded into a rolling summary
+    that is cached on the session and only recomputed when the dropped messages change.
+    `reserve_tokens` is held back for the system and user messages the caller adds.
+    Returns (messages, stats).
+    """
+    summarizer = summarizer or extractive_summary
+    text_msgs = ss.messages.view("text")
+    available = max(budget - reserve_tokens - SUMMARY_TOKEN_BUDGET, 0)
+
+    kept_tokens = 0
+    cut = len(text_msgs)
+    while cut > 0:
+        tokens = count_message_tokens(text_msgs[cut - 1])
+        # Always keep the newest turn, even if it alone exceeds the budget
+        if kept_tokens + tokens > available and cut < len(text_msgs):
+            break
+        kept_tokens += tokens
+        cut -= 1
+
+    if cut and DROP_GRANULARITY > 1:
+        aligned = min(-(-cut // DROP_GRANULARITY) * DROP_GRANULARITY, len(text_msgs) - 1)
+        kept_tokens -= sum(count_message_tokens(msg) for msg in text_msgs[cut:aligned])
+        cut = aligned
+
+    dropped = text_msgs[:cut]
+    dropped_tokens = sum(count_message_tokens(msg) for msg in dropped)
+    messages = []
+    summary_tokens = 0
+    if dropped:
+        key = fingerprint(dropped)
+        cached = ss.get("context_summary")
+        if cached is None or cached["key"] != key:
+            cached = {"key": key, "text": summarizer(dropped)}
+            ss.context_summary = cached
+        messages.append({"role": "system", "content": cached["text"]})
+        summary_tokens = estimate_tokens(cached["text"]) + MESSAGE_OVERHEAD_TOKENS
+
+    messages.extend(msg.as_api() for msg in text_msgs[cut:])
+    stats = {
+        "kept_messages": len(text_msgs) - cut,
+        "kept_tokens": kept_tokens,
+        "dropped_messages": cut,
+        "dropped_tokens": dropped_tokens,
+        "summary_tokens": summary_tokens,
+    }
+    ss.context_stats = stats
+    return messages, stats
@@ -1,12 +1,51 @@
 import os
-import requests
+import asyncio
 import base64
-from typing import List
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Sequence
 import json
+import httpx
+from core import providers
 
 CLOUDFLARE_API_TOKEN = os.getenv("CLOUDFLARE_API_TOKEN")
 CLOUDFLARE_ACCOUNT_ID = os.getenv("CLOUDFLARE_ACCOUNT_ID")
 DEFAULT_MODEL = "@cf/stabilityai/stable-diffusion-xl-base-1.0"
+DEFAULT_PARALLELISM = 4
+IMAGE_SIZES = ("1024x1024", "768x1344", "1344x768", "512x512")
+
+
+class ImageResult:
+    """Outcome of one image request in a multi-image run: `images` on success, `error` otherwise."""
+
+    __slots__ = ("index", "spec", "images", "error", "latency")
+
+    def __init__(self, index: int, spec: dict, images: Optional[List[bytes]] = None, error: Optional[str] = None,
+                 latency: float = 0.0):
+        self.index = index
+        self.spec = spec
+        self.images = images or []
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def image_specs(count: int, sizes: Sequence[str] = ("1024x1024",), seed: Optional[int] = None) -> List[dict]:
+    """
+    Builds `count` request specs, cycling through `sizes` ("WIDTHxHEIGHT").
+    With a `seed`, request i uses seed + i so a run can be reproduced.
+    """
+    sizes = list(sizes) or ["1024x1024"]
+    specs = []
+    for i in range(count):
+        width, height = (int(v) for v in sizes[i % len(sizes)].lower().split("x"))
+        spec = {"width": width, "height": height}
+        if seed is not None:
+            spec["seed"] = seed + i
+        specs.append(spec)
+    return specs
 
 
 class ImageGenerator:
@@ -27,22 +66,27 @@ class ImageGenerator:
                 "Set them and restart your terminal/VSCode."
             )
 
-        self.url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/ai/run/{self.model_slug}"
+        self.url = f"{providers.CLOUDFLARE_API_BASE}/accounts/{self.account_id}/ai/run/{self.model_slug}"
         self.headers = {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json",
         }
 
-    def generate(self, prompt: str, width: int = 1024, height: int = 1024, **kwargs) -> List[bytes]:
+    def generate(self, prompt: str, width: int = 1024, height: int = 1024, scope=None, **kwargs) -> List[bytes]:
         """
         Generate image(s) from prompt and return a list of raw image bytes.
         kwargs are forwarded in JSON payload (e.g., guidance_scale, aspect_ratio if supported).
+        Blocks until done; `scope` is an optional providers.CallScope used to cancel on rerun.
         """
+        return providers.run_sync(self.agenerate(prompt, width, height, **kwargs), scope)
+
+    async def agenerate(self, prompt: str, width: int = 1024, height: int = 1024, **kwargs) -> List[bytes]:
+        """Async variant of `generate`, bounded by the provider layer's Cloudflare concurrency limit."""
         payload = {"prompt": prompt, "width": width, "height": height, **kwargs}
 
         try:
-            resp = requests.post(self.url, headers=self.headers, json=payload, timeout=self.timeout)
-        except requests.exceptions.RequestException as e:
+            resp = await providers.generate_image(self.url, self.headers, payload, deadline=self.timeout, model=self.model_slug)
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Request failed: {e}")
 
         if resp.status_code != 200:
@@ -83,6 +127,39 @@ class ImageGenerator:
 
         return [image_bytes]
 
+    async def astream_many(self, prompt: str, specs: Sequence[dict],
+                           parallelism: int = DEFAULT_PARALLELISM) -> AsyncIterator[ImageResult]:
+        """
+        Runs one request per spec, at most `parallelism` at a time, yielding each ImageResult
+        as soon as it finishes. A failing request yields its error; the others carry on.
+        """
+        limit = asyncio.Semaphore(max(1, parallelism))
+
+        async def run_one(index, spec):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    images = await self.agenerate(prompt, **spec)
+                except Exception as e:
+                    return ImageResult(index, spec, error=str(e), latency=time.perf_counter() - start)
+                return ImageResult(index, spec, images=images, latency=time.perf_counter() - start)
+
+        tasks = [asyncio.ensure_future(run_one(i, spec)) for i, spec in enumerate(specs)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def generate_many(self, prompt: str, specs: Sequence[dict], parallelism: int = DEFAULT_PARALLELISM,
+                      scope=None) -> Iterator[ImageResult]:
+        """
+        Concurrent multi-image generation; iterate to receive ImageResults in completion order.
+        Stopping early (e.g. a rerun) cancels the requests still running.
+        """
+        return providers.iter_sync(self.astream_many(prompt, specs, parallelism), scope)
+
 
 # test
 if __name__ == "__main__":
@@ -1,23 +1,211 @@
-import streamlit as st
-from datetime import datetime
-from typing import Any
+import sys
+import time
+from typing import Any, Iterator, List, Optional
 
-def init_session(ss: Any):
-    """Initializes the session state for messages if not already present."""
+from core.session_store import TAIL_MESSAGES
+
+
+class Message:
+    """
+    A single chat turn.
+    Supports dict-style access (msg["content"], msg.get("type")) so callers written
+    against the old list-of-dicts layout keep working.
+    """
+
+    __slots__ = ("role", "content", "type", "created", "_tokens", "_api")
+
+    def __init__(self, role: str, content: str, msg_type: str = "text", created: Optional[float] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.type = sys.intern(msg_type)
+        self.created = time.time() if created is None else created
+        self._api = None
+
+    @property
+    def timestamp(self) -> str:
+        return time.strftime("%H:%M:%S", time.localtime(self.created))
+
+    def as_api(self) -> dict:
+        """Returns the {"role", "content"} dict for API calls, built once per content value."""
+        api = self._api
+        if api is None or api["content"] is not self.content:
+            api = self._api = {"role": self.role, "content": self.content}
+        return api
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+class TypeView:
+    """Read-only sequence over the messages of one type, backed by the store's index list."""
+
+    __slots__ = ("_records", "_indexes", "_base")
+
+    def __init__(self, records: List[Message], indexes: List[int], base: int = 0):
+        self._records = records
+        self._indexes = indexes
+        self._base = base
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._records[j - self._base] for j in self._indexes[i]]
+        return self._records[self._indexes[i] - self._base]
+
+    def __iter__(self) -> Iterator[Message]:
+        records, base = self._records, self._base
+        for j in self._indexes:
+            yield records[j - base]
+
+
+class MessageStore:
+    """
+    Append-only chat history with per-type index lists.
+    `version` increases on every change, so downstream caches can key on it.
+    With a session backend, every change is also written to the session's log, and a reopened
+    session holds only its newest turns; `base` is the position of the first loaded message
+    and older turns are fetched with `load_older`.
+    Objects in `listeners` are told about every message entering memory (`added(idx, msg)`),
+    every edit (`updated(idx, old_content, msg)`) and `cleared()`, so derived state such as
+    utils.analytics can be kept up to date without rescanning the history.
+    """
+
+    def __init__(self, backend: Any = None, session_id: Optional[str] = None):
+        self._records: List[Message] = []
+        self._by_type = {}
+        self.version = 0
+        self.base = 0
+        self.backend = backend
+        self.session_id = session_id
+        self.listeners = []
+
+    @classmethod
+    def open(cls, backend: Any, session_id: str, tail: int = TAIL_MESSAGES) -> "MessageStore":
+        """Reopens a persisted session, loading only its newest `tail` messages."""
+        store = cls(backend, session_id)
+        start, rows = backend.load_tail(session_id, tail)
+        store.base = start
+        for _, role, content, msg_type, created in rows:
+            store._add(Message(role, content, msg_type, created))
+        return store
+
+    def _add(self, msg: Message):
+        self._by_type.setdefault(msg.type, []).append(self.base + len(self._records))
+        self._records.append(msg)
+
+    def _notify_added(self, idx: int, msg: Message):
+        for listener in self.listeners:
+            listener.added(idx, msg)
+
+    def append(self, role: str, content: str, msg_type: str = "text", created: Optional[float] = None) -> Message:
+        msg = Message(role, content, msg_type, created)
+        seq = self.base + len(self._records)
+        self._add(msg)
+        self.version += 1
+        self._notify_added(seq, msg)
+        if self.backend is not None:
+            self.backend.append(self.session_id, seq, msg.role, msg.content, msg.type, msg.created)
+        return msg
+
+    def update(self, idx: int, content: str):
+        """Replaces the content of the message at `idx` (e.g. after Regenerate)."""
+        msg = self._records[idx - self.base]
+        old_content, msg.content = msg.content, content
+        self.version += 1
+        for listener in self.listeners:
+            listener.updated(idx, old_content, msg)
+        if self.backend is not None:
+            self.backend.edit(self.session_id, idx, content)
+
+    def clear(self):
+        self._records = []
+        self._by_type = {}
+        self.base = 0
+        self.version += 1
+        for listener in self.listeners:
+            listener.cleared()
+        if self.backend is not None:
+            self.backend.clear(self.session_id)
+
+    def load_older(self, n: int) -> int:
+        """Loads up to `n` older turns from the backend and returns how many were loaded."""
+        if self.backend is None or self.base == 0:
+            return 0
+        start = max(self.base - n, 0)
+        rows = self.backend.load(self.session_id, start, self.base)
+        loaded = self._records
+        self._records, self._by_type, self.base = [], {}, start
+        for seq, role, content, msg_type, created in rows:
+            msg = Message(role, content, msg_type, created)
+            self._add(msg)
+            self._notify_added(seq, msg)
+        for msg in loaded:
+            self._add(msg)
+        self.version += 1
+        return len(rows)
+
+    def load_all(self) -> int:
+        """Loads every turn not yet in memory (e.g. before a full export)."""
+        return self.load_older(self.base)
+
+    def indexes(self, msg_type: str) -> List[int]:
+        """Positions of all loaded messages of `msg_type`, oldest first. Do not mutate the returned list."""
+        return self._by_type.get(msg_type, [])
+
+    def view(self, msg_type: str) -> TypeView:
+        return TypeView(self._records, self.indexes(msg_type), self.base)
+
+    def count(self, msg_type: str) -> int:
+        return len(self.indexes(msg_type))
+
+    def __len__(self) -> int:
+        return self.base + len(self._records)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._records)
+
+    def __getitem__(self, idx: int) -> Message:
+        return self._records[idx - self.base]
+
+
+def init_session(ss: Any, backend: Any = None, session_id: Optional[str] = None):
+    """
+    Initializes the session state for messages if not already present.
+    With a backend and session id, a previously persisted session is reopened.
+    """
     if "messages" not in ss:
-        ss.messages = []
+        ss.messages = MessageStore.open(backend, session_id) if backend is not None else MessageStore()
+    elif isinstance(ss.messages, list):
+        store = MessageStore()
+        for msg in ss.messages:
+            store.append(msg["role"], msg["content"], msg.get("type", "text"))
+        ss.messages = store
 
 def add_message(ss: Any, role: str, content: str, msg_type: str = "text"):
     """
     Adds a message to the session state with a role, content, timestamp, and type.
     msg_type can be 'text' or 'image'.
     """
-    ts = datetime.now().strftime("%H:%M:%S")
-    ss.messages.append({"role": role, "content": content, "timestamp": ts, "type": msg_type})
+    return ss.messages.append(role, content, msg_type)
+
+def update_message(ss: Any, idx: int, content: str):
+    """Replaces the content of an existing message."""
+    ss.messages.update(idx, content)
 
 def get_messages(ss: Any):
-    """Returns the list of messages from the session state."""
-    return ss.get("messages", [])
+    """Returns the message store from the session state."""
+    return ss.get("messages", MessageStore())
 
 def get_api_ready_messages(ss: Any):
     """
@@ -25,12 +213,9 @@ def get_api_ready_messages(ss: Any):
     Returns a clean list of messages (only role and content) for API calls.
     Filters out image generation messages to keep the text model's context clean.
     """
-    return [
-        {"role": msg["role"], "content": msg["content"]}
-        for msg in ss.messages
-        if msg.get("type", "text") == "text" # Only include text messages for the LLM context
-    ]
+    return [msg.as_api() for msg in ss.messages.view("text")] # Only include text messages for the LLM context
 
 def clear_messages(ss: Any):
-    """Clears all messages from the session state."""
-    ss.messages = []
\ No newline at end of file
+    """Clears all messages from the session state, with the rolling summary built from them."""
+    ss.messages.clear()
+    ss.pop("context_summary", None)
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+METRIC_PREFIX = "content_assistant"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+BYTES_BUCKETS = (1_000, 4_000, 16_000, 64_000, 256_000, 1_000_000, 4_000_000)
+
+# name -> (help text, bucket upper bounds)
+HISTOGRAMS = {
+    "queue_seconds": ("Time spent waiting for a provider concurrency slot", LATENCY_BUCKETS),
+    "ttft_seconds": ("Time from call start to the first streamed token", LATENCY_BUCKETS),
+    "latency_seconds": ("Total call latency including queueing", LATENCY_BUCKETS),
+    "prompt_tokens": ("Prompt tokens reported by the provider", TOKEN_BUCKETS),
+    "completion_tokens": ("Completion tokens reported by the provider", TOKEN_BUCKETS),
+    "request_bytes": ("Serialized request payload size", BYTES_BUCKETS),
+    "response_bytes": ("Response payload size", BYTES_BUCKETS),
+}
+
+
+def payload_bytes(payload) -> int:
+    """Size of `payload` serialized as compact JSON, as sent over the wire."""
+    return len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def error_class(error) -> str:
+    """Short label for a failure: "cancelled", "timeout", an exception class name, or the string given."""
+    if isinstance(error, str):
+        return error
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return type(error).__name__
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout. Quantiles are interpolated within
+    buckets and clamped to the observed min/max, so sparse data does not report bucket midpoints.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "min", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        return min(max(self._interpolate(q), self.min), self.max)
+
+    def _interpolate(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+
+class CallMetrics:
+    """
+    Measurements for one provider call. Created by MetricsRegistry.start when the call is issued;
+    the provider layer marks `acquired()` and `first_token()` and calls `finish()` exactly once.
+    """
+
+    __slots__ = ("registry", "provider", "model", "action", "start", "queue", "ttft",
+                 "prompt_tokens", "completion_tokens", "request_bytes", "response_bytes")
+
+    def __init__(self, registry, provider: str, model: str, action: str, request_bytes: int = 0):
+        self.registry = registry
+        self.provider = provider
+        self.model = model
+        self.action = action
+        self.start = time.perf_counter()
+        self.queue = None
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+
+    def acquired(self):
+        """Marks the end of queueing (the concurrency slot was granted)."""
+        self.queue = time.perf_counter() - self.start
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def finish(self, error=None):
+        self.registry.record(self, time.perf_counter() - self.start, error)
+
+
+class MetricsRegistry:
+    """
+    Process-wide histograms and counters, labelled by model and action
+    (chat, template, regenerate, expand, shorten, image, ...).
+    With `jsonl_path` set, every call and cache hit is also appended to a JSONL file.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, model, action) -> Histogram
+        self._calls = {}       # (model, action) -> count
+        self._errors = {}      # (model, action, error class) -> count
+        self._cache_hits = {}  # (model, action) -> count
+
+    def start(self, provider: str, model: str, action: str, request_bytes: int = 0) -> CallMetrics:
+        return CallMetrics(self, provider, model, action, request_bytes)
+
+    def _observe(self, name, model, action, value):
+        key = (name, model, action)
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+        hist.observe(value)
+
+    def record(self, call: CallMetrics, latency: float, error=None):
+        labels = (call.model, call.action)
+        error = error_class(error) if error is not None else None
+        with self._lock:
+            self._calls[labels] = self._calls.get(labels, 0) + 1
+            if error is not None:
+                key = labels + (error,)
+                self._errors[key] = self._errors.get(key, 0) + 1
+            self._observe("latency_seconds", *labels, latency)
+            self._observe("request_bytes", *labels, call.request_bytes)
+            if call.queue is not None:
+                self._observe("queue_seconds", *labels, call.queue)
+            if error is None:
+                self._observe("response_bytes", *labels, call.response_bytes)
+                if call.ttft is not None:
+                    self._observe("ttft_seconds", *labels, call.ttft)
+                if call.prompt_tokens is not None:
+                    self._observe("prompt_tokens", *labels, call.prompt_tokens)
+                if call.completion_tokens is not None:
+                    self._observe("completion_tokens", *labels, call.completion_tokens)
+        self._write({
+            "event": "call", "provider": call.provider, "model": call.model, "action": call.action,
+            "queue": call.queue, "ttft": call.ttft, "latency": latency,
+            "prompt_tokens": call.prompt_tokens, "completion_tokens": call.completion_tokens,
+            "request_bytes": call.request_bytes, "response_bytes": call.response_bytes, "error": error,
+        })
+
+    def record_cache_hit(self, model: str, action: str):
+        labels = (model, action)
+        with self._lock:
+            self._cache_hits[labels] = self._cache_hits.get(labels, 0) + 1
+        self._write({"event": "cache_hit", "model": model, "action": action})
+
+    def _write(self, record: dict):
+        if not self.jsonl_path:
+            return
+        record["ts"] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def quantile(self, name: str, model: str, action: str, q: float) -> Optional[float]:
+        with self._lock:
+            hist = self._histograms.get((name, model, action))
+            return hist.quantile(q) if hist is not None else None
+
+    def summary(self) -> List[dict]:
+        """One row per (model, action) with call/error/cache counts and p50/p95 queue, TTFT and latency."""
+        with self._lock:
+            labels = sorted(set(self._calls) | set(self._cache_hits))
+            rows = []
+            for model, action in labels:
+                row = {
+                    "model": model,
+                    "action": action,
+                    "calls": self._calls.get((model, action), 0),
+                    "errors": sum(n for (m, a, _), n in self._errors.items() if (m, a) == (model, action)),
+                    "cache_hits": self._cache_hits.get((model, action), 0),
+                }
+                for name in ("queue_seconds", "ttft_seconds", "latency_seconds"):
+                    hist = self._histograms.get((name, model, action))
+                    for q in (0.5, 0.95):
+                        row[f"{name.split('_')[0]}_p{int(q * 100)}"] = hist.quantile(q) if hist is not None else None
+                rows.append(row)
+        return rows
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                full = f"{METRIC_PREFIX}_{name}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} histogram"]
+                for (hist_name, model, action), hist in sorted(self._histograms.items()):
+                    if hist_name != name:
+                        continue
+                    labels = f'model="{model}",action="{action}"'
+                    cumulative = 0
+                    for bound, c in zip(hist.bounds + (float("inf"),), hist.counts):
+                        cumulative += c
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{full}_bucket{{{labels},le="{le}"}} {cumulative}')
+                    lines.append(f"{full}_sum{{{labels}}} {hist.sum:g}")
+                    lines.append(f"{full}_count{{{labels}}} {hist.count}")
+            for name, help_text, counts in (
+                ("calls_total", "Provider calls issued", self._calls),
+                ("cache_hits_total", "Requests answered from the response cache", self._cache_hits),
+            ):
+                full = f"{METRIC_PREFIX}_{name}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} counter"]
+                for (model, action), n in sorted(counts.items()):
+                    lines.append(f'{full}{{model="{model}",action="{action}"}} {n}')
+            full = f"{METRIC_PREFIX}_errors_total"
+            lines += [f"# HELP {full} Failed provider calls by error class", f"# TYPE {full} counter"]
+            for (model, action, error), n in sorted(self._errors.items()):
+                lines.append(f'{full}{{model="{model}",action="{action}",error="{error}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._calls.clear()
+            self._errors.clear()
+            self._cache_hits.clear()
+
+
+# Set METRICS_JSONL_PATH to append one JSON line per provider call
+metrics = MetricsRegistry(jsonl_path=os.getenv("METRICS_JSONL_PATH"))
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = None) -> ThreadingHTTPServer:
+    """Serves `registry` in the Prometheus text format at http://host:port/metrics from a daemon thread."""
+    registry = registry or metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def ensure_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Starts the /metrics endpoint once per process when METRICS_PORT is set."""
+    global _server
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = start_metrics_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+    return _server
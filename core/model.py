@@ -1,23 +1,157 @@
 import os
-from groq import Groq
-from dotenv import load_dotenv
+import time
+from core import providers, resilience
+from core.cache import ResponseCache, make_cache_key
+from core.metrics import metrics
+from core.resilience import GenerationError
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+# Smaller/faster models tried in order when the primary is failing, rate limited or over its latency SLO
+FALLBACK_MODELS = [m.strip() for m in os.getenv("GROQ_FALLBACK_MODELS", "llama-3.1-8b-instant").split(",") if m.strip()]
+MODELS = [MODEL] + [m for m in FALLBACK_MODELS if m != MODEL]
+TEMPERATURE = 0.7
+MAX_TOKENS = 1024
 
-def generate_response(messages):
+# Set RESPONSE_CACHE_PATH to a file path to persist cached responses across sessions
+response_cache = ResponseCache(db_path=os.getenv("RESPONSE_CACHE_PATH"))
+
+
+def set_client(new_client):
+    """
+    Replaces the chat client used by the provider layer.
+    Any object exposing `chat.completions.create(...)` works, e.g. a fake streaming client for offline tests.
+    """
+    providers.set_chat_client(new_client)
+
+
+def generate_response(messages, use_cache=True, scope=None, action="chat"):
     """
     Calls Groq LLM and returns text output.
     `messages` must be a list of dicts: [{"role": ..., "content": ...}]
+    Pass use_cache=False to force a fresh sample (the result still refreshes the cache).
+    `scope` is an optional providers.CallScope used to cancel the call on rerun.
+    `action` labels the call in core.metrics (chat, template, regenerate, expand, shorten).
+    Transient failures are retried and may fall back to FALLBACK_MODELS; raises GenerationError
+    when no model could answer.
+    """
+    key = make_cache_key(MODEL, messages, TEMPERATURE, MAX_TOKENS)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            metrics.record_cache_hit(MODEL, action)
+            return cached
+    else:
+        response_cache.record_bypass()
+    route = resilience.Route()
+    text = providers.run_sync(resilience.complete(messages, MODELS, TEMPERATURE, MAX_TOKENS, action=action, route=route), scope)
+    # A fallback model's reply is not cached under the primary model's key
+    if route.model == MODEL:
+        response_cache.put(key, text)
+    return text
+
+
+class StreamResult:
     """
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1024,
+    Iterable of text deltas from a streaming Groq completion.
+    Once iteration finishes, `text` holds the full reply, `model` the model that wrote it and
+    `ttft` / `tokens_per_sec` the timings. If generation fails, iteration raises GenerationError
+    and `error` holds it; `text` then stays empty so the failure is never saved as a reply.
+    Replies from an injected `api_client` neither read nor fill the shared response cache.
+    """
+
+    def __init__(self, messages, api_client=None, use_cache=True, scope=None, action="chat"):
+        self.messages = messages
+        self.api_client = api_client
+        self.use_cache = use_cache
+        self.scope = scope
+        self.action = action
+        self.cached = False
+        self.model = None
+        self.error = None
+        self.text = ""
+        self.ttft = None
+        self.total_time = None
+        self.completion_tokens = 0
+
+    def __iter__(self):
+        parts = []
+        usage_tokens = None
+        start = time.perf_counter()
+        key = make_cache_key(MODEL, self.messages, TEMPERATURE, MAX_TOKENS)
+        cacheable = self.api_client is None
+        if self.use_cache and cacheable:
+            cached = response_cache.get(key)
+            if cached is not None:
+                self.cached = True
+                self.model = MODEL
+                metrics.record_cache_hit(MODEL, self.action)
+                self.text = cached
+                self.ttft = self.total_time = time.perf_counter() - start
+                yield cached
+                return
+        elif cacheable:
+            response_cache.record_bypass()
+        route = resilience.Route()
+        stream = providers.iter_sync(
+            resilience.stream(self.messages, MODELS, TEMPERATURE, MAX_TOKENS, action=self.action,
+                              client=self.api_client, route=route),
+            self.scope,
         )
-        return response.choices[0].message.content.strip()
+        try:
+            for chunk in stream:
+                # Groq reports exact usage on the final chunk under `x_groq`
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None:
+                    usage_tokens = usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - start
+                self.completion_tokens += 1
+                parts.append(delta)
+                yield delta
+        except GenerationError as e:
+            self.error = e
+            parts = []
+            raise
+        finally:
+            # Closing the bridge cancels the request if the consumer stopped early
+            stream.close()
+            self.model = route.model
+            self.total_time = time.perf_counter() - start
+            if usage_tokens is not None:
+                self.completion_tokens = usage_tokens
+            self.text = "".join(parts).strip()
+        if self.text and self.model == MODEL and cacheable:
+            response_cache.put(key, self.text)
+
+    @property
+    def tokens_per_sec(self):
+        """Completion tokens per second, measured from the first token to the end of the stream."""
+        if self.ttft is None or self.total_time is None:
+            return 0.0
+        elapsed = self.total_time - self.ttft
+        return self.completion_tokens / elapsed if elapsed > 0 else 0.0
 
-    except Exception as e:
-        return f"⚠️ Error: {str(e)}"
+    def stats(self):
+        """Returns the timing numbers as a plain dict."""
+        return {
+            "ttft": self.ttft,
+            "total_time": self.total_time,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+            "cached": self.cached,
+            "model": self.model,
+        }
+
+
+def stream_response(messages, api_client=None, use_cache=True, scope=None, action="chat"):
+    """
+    Streaming counterpart of `generate_response`.
+    Returns a StreamResult; iterate it (or pass it to `st.write_stream`) to receive text deltas as they arrive.
+    A cache hit is yielded as a single delta.
+    """
+    return StreamResult(messages, api_client=api_client, use_cache=use_cache, scope=scope, action=action)
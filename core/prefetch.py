@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+from core import providers, resilience, scheduler
+from core.context import estimate_tokens
+from core.model import MAX_TOKENS, MODELS, TEMPERATURE
+
+# Estimated tokens (prompt + completion allowance) one session may spend on speculation at once;
+# the budget refills at SPECULATION_TOKENS_PER_MINUTE so a long session keeps prefetching
+SPECULATION_TOKEN_BUDGET = int(os.getenv("SPECULATION_TOKEN_BUDGET", "20000"))
+SPECULATION_TOKENS_PER_MINUTE = float(os.getenv("SPECULATION_TOKENS_PER_MINUTE", "4000"))
+MAX_SPECULATIONS = 8  # finished or pending results kept per session
+MAX_PENDING = 2
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+class Speculator:
+    """
+    Precomputes message actions (Shorten, optionally Expand) in the background so a click can
+    swap the result in without waiting. Results are keyed by (message index, action, content
+    hash), so an edited message never receives a stale result. Speculative calls run at bulk
+    priority in their own scope (a rerun does not cancel them) and pause while the session's
+    token budget, a bucket refilling at `tokens_per_minute`, is spent.
+    """
+
+    def __init__(self, session_id: str = "", budget_tokens: int = SPECULATION_TOKEN_BUDGET,
+                 tokens_per_minute: float = SPECULATION_TOKENS_PER_MINUTE):
+        self.scope = providers.CallScope(session_id, priority=scheduler.BULK)
+        self.budget = scheduler.TokenBucket(tokens_per_minute, capacity=budget_tokens)
+        self.spent_tokens = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.skipped = 0
+        self._entries = OrderedDict()  # (idx, action, hash) -> Future
+        self._used = set()
+        self._lock = threading.Lock()
+
+    def speculate(self, idx: int, content: str, actions: Sequence[str], build_messages: Callable[[str], List[dict]]):
+        """
+        Starts background generation of `actions` for the message at `idx` unless already started.
+        `build_messages(action)` returns the API messages the click would send; it is only called
+        for work that is actually scheduled.
+        """
+        digest = content_hash(content)
+        for action in actions:
+            key = (idx, action, digest)
+            with self._lock:
+                if key in self._entries:
+                    continue
+                if sum(not fut.done() for fut in self._entries.values()) >= MAX_PENDING:
+                    self.skipped += 1
+                    return
+            messages = build_messages(action)
+            cost = sum(estimate_tokens(m["content"]) for m in messages) + MAX_TOKENS
+            with self._lock:
+                if self.budget.wait_time(cost) > 0:
+                    self.skipped += 1
+                    return
+                self.budget.take(cost)
+                self.spent_tokens += cost
+                self._entries[key] = providers.submit(
+                    resilience.complete(messages, MODELS, TEMPERATURE, MAX_TOKENS, action=f"prefetch_{action}"),
+                    self.scope,
+                )
+                self._evict()
+
+    def take(self, idx: int, action: str, content: str) -> Optional[str]:
+        """
+        Returns the speculated result for a click, or None (a miss) if nothing usable has finished.
+        A speculation still running is cancelled rather than waited for: it is queued at bulk
+        priority, so the click is faster streamed as a fresh interactive call.
+        """
+        key = (idx, action, content_hash(content))
+        with self._lock:
+            fut = self._entries.get(key)
+            if fut is not None and not fut.done():
+                self._drop(key)
+                fut = None
+        if fut is not None and not fut.cancelled():
+            try:
+                text = fut.result()
+            except Exception:
+                text = None
+            if text:
+                with self._lock:
+                    self.hits += 1
+                    self._used.add(key)
+                return text
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def invalidate(self, idx: int):
+        """Drops every speculation for the message at `idx` (e.g. after it was edited)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == idx]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+            self.budget.tokens = self.budget.capacity
+            self.spent_tokens = 0
+
+    def _drop(self, key):
+        fut = self._entries.pop(key)
+        if not fut.cancel() and key not in self._used:
+            self.wasted += 1
+        self._used.discard(key)
+
+    def _evict(self):
+        while len(self._entries) > MAX_SPECULATIONS:
+            self._drop(next(iter(self._entries)))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(not fut.done() for fut in self._entries.values())
+            available = max(int(self.budget.available()), 0)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "wasted": self.wasted,
+            "skipped": self.skipped,
+            "pending": pending,
+            "spent_tokens": self.spent_tokens,
+            "available_tokens": available,
+            "budget_tokens": int(self.budget.capacity),
+        }
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+from typing import List, Optional
+
+# Rough per-message framing cost (role markers, separators) in characters
+MESSAGE_OVERHEAD_CHARS = 8
+
+
+def request_chars(messages: List[dict]) -> int:
+    """Approximate serialized size of a request in characters."""
+    return sum(len(m["role"]) + len(m["content"]) + MESSAGE_OVERHEAD_CHARS for m in messages)
+
+
+def shared_prefix_chars(previous: List[dict], current: List[dict]) -> int:
+    """
+    Number of leading characters `current` shares with `previous` when both are serialized
+    message by message - the part a provider-side prefix cache could reuse.
+    """
+    shared = 0
+    for old, new in zip(previous, current):
+        if old["role"] != new["role"]:
+            break
+        if old["content"] == new["content"]:
+            shared += len(new["role"]) + len(new["content"]) + MESSAGE_OVERHEAD_CHARS
+            continue
+        shared += len(new["role"]) + len(os.path.commonprefix([old["content"], new["content"]]))
+        break
+    return shared
+
+
+class PrefixTracker:
+    """
+    Measures prefix reuse between consecutive requests of one session.
+    With `record_path` set, every request is also appended to a JSONL file for offline analysis
+    (see benchmarks/prefix_reuse.py).
+    """
+
+    def __init__(self, session_id: str = "", record_path: Optional[str] = None):
+        self.session_id = session_id
+        self.record_path = record_path
+        self._previous = None
+        self.requests = 0
+        self.reused_chars = 0
+        self.total_chars = 0
+        self.last_ratio = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, messages: List[dict]) -> float:
+        """Records a request and returns the fraction of it that repeats the previous request's prefix."""
+        total = request_chars(messages)
+        with self._lock:
+            reused = shared_prefix_chars(self._previous, messages) if self._previous is not None else 0
+            self._previous = [{"role": m["role"], "content": m["content"]} for m in messages]
+            self.requests += 1
+            self.reused_chars += reused
+            self.total_chars += total
+            self.last_ratio = reused / total if total else 0.0
+            if self.record_path:
+                with open(self.record_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"session": self.session_id, "messages": self._previous}, ensure_ascii=False) + "\n")
+        return self.last_ratio
+
+    @property
+    def ratio(self) -> float:
+        """Reused-prefix ratio over every request recorded so far."""
+        return self.reused_chars / self.total_chars if self.total_chars else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "reused_chars": self.reused_chars,
+            "total_chars": self.total_chars,
+            "ratio": self.ratio,
+            "last_ratio": self.last_ratio,
+        }
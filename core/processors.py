@@ -1,40 +1,38 @@
-def build_prompt(user_input, tone="Default", style="Default", format_type="Default", reference_post=None):
+import os
+from functools import lru_cache
+from core.templates import compile_template
 
-    """
-    Preprocess user input with style instructions.
-    Can optionally include a reference post to guide the output style.
-    Returns system + user messages for Groq API.
-    """
-    instructions = []
+TONES = ["Default", "Formal", "Casual", "Persuasive", "Humorous"]
+STYLES = ["Default", "Narrative", "Analytical", "Creative", "Technical", "Academic", "Shakespearean"]
+FORMATS = ["Default", "Email", "LinkedIn Post", "Tweet / Thread", "Blog Post", "Journal / Diary Entry", "Story / Fiction", "Summary / Report"]
 
-    if tone != "Default":
-        instructions.append(f"Use a {tone.lower()} tone.")
-    if style != "Default":
-        instructions.append(f"Follow a {style.lower()} writing style.")
-    
-    if format_type != "Default":
-        if format_type.lower() == "email":
-            instructions.append("Write this as a professional email.")
-        elif format_type.lower() == "linkedin post":
-            instructions.append("Write this as a concise, professional LinkedIn post.")
-        elif format_type.lower() == "tweet / thread":
-            instructions.append("Write this as a short, attention-grabbing tweet or thread.")
-        elif format_type.lower() == "blog post":
-            instructions.append("Write this as a detailed, engaging blog post.")
-        elif format_type.lower() == "journal / diary entry":
-            instructions.append("Write this as a personal journal or diary entry.")
-        elif format_type.lower() == "story / fiction":
-            instructions.append("Write this as a creative story or fiction piece.")
-        elif format_type.lower() == "summary / report":
-            instructions.append("Write this as a clear and concise summary or report.")
-        else:
-            instructions.append(f"Format the response as a {format_type.lower()}.")
-
-    system_msg = " ".join(instructions) if instructions else "Respond helpfully to the user."
+DEFAULT_SYSTEM_PROMPT = "Respond helpfully to the user."
 
-    # If a reference post is provided, create a detailed user prompt
-    if reference_post:
-        final_user_content = f"""
+# "classic" (the default) puts the per-turn instructions in the system message, as build_prompt does.
+# Set PROMPT_LAYOUT=stable to keep the system message fixed and append per-turn instructions to the
+# final user message, so consecutive requests share a long prefix that provider-side prompt caches
+# can reuse. This changes the prompt bytes and system message every request is sent with.
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic")
+STABLE_SYSTEM_PROMPT = (
+    "You are a helpful content writing assistant. "
+    "When the latest user message ends with writing instructions, follow them."
+)
+STABLE_SYSTEM_MESSAGE = {"role": "system", "content": STABLE_SYSTEM_PROMPT}
+
+# Instruction per option, keyed by lowercased name. Options not listed fall back to the generic phrasing.
+TONE_INSTRUCTIONS = {}
+STYLE_INSTRUCTIONS = {}
+FORMAT_INSTRUCTIONS = {
+    "email": "Write this as a professional email.",
+    "linkedin post": "Write this as a concise, professional LinkedIn post.",
+    "tweet / thread": "Write this as a short, attention-grabbing tweet or thread.",
+    "blog post": "Write this as a detailed, engaging blog post.",
+    "journal / diary entry": "Write this as a personal journal or diary entry.",
+    "story / fiction": "Write this as a creative story or fiction piece.",
+    "summary / report": "Write this as a clear and concise summary or report.",
+}
+
+REFERENCE_POST_PROMPT = compile_template('''
 Your primary task is to respond to the following request: "{user_input}"
 
 ---
@@ -44,11 +42,86 @@ Your primary task is to respond to the following request: "{user_input}"
 \"\"\"
 {reference_post}
 \"\"\"
-"""
+''')
+
+
+@lru_cache(maxsize=1024)
+def system_instruction(tone="Default", style="Default", format_type="Default"):
+    """Returns the system instruction for a tone/style/format combination, memoized."""
+    instructions = []
+    if tone != "Default":
+        key = tone.lower()
+        instructions.append(TONE_INSTRUCTIONS.get(key) or f"Use a {key} tone.")
+    if style != "Default":
+        key = style.lower()
+        instructions.append(STYLE_INSTRUCTIONS.get(key) or f"Follow a {key} writing style.")
+    if format_type != "Default":
+        key = format_type.lower()
+        instructions.append(FORMAT_INSTRUCTIONS.get(key) or f"Format the response as a {key}.")
+    return " ".join(instructions) if instructions else DEFAULT_SYSTEM_PROMPT
+
+
+def register_instruction(kind, name, instruction):
+    """
+    Adds or overrides the instruction for a tone, style or format option at runtime.
+    `kind` is "tone", "style" or "format"; new options are also offered in the UI lists.
+    """
+    table, options = {
+        "tone": (TONE_INSTRUCTIONS, TONES),
+        "style": (STYLE_INSTRUCTIONS, STYLES),
+        "format": (FORMAT_INSTRUCTIONS, FORMATS),
+    }[kind]
+    table[name.lower()] = instruction
+    if name not in options:
+        options.append(name)
+    system_instruction.cache_clear()
+    _precompute()
+
+
+def _precompute():
+    # Warm the memo with every combination the UI can produce
+    for tone in TONES:
+        for style in STYLES:
+            for format_type in FORMATS:
+                system_instruction(tone, style, format_type)
+
+
+_precompute()
+
+
+def build_prompt(user_input, tone="Default", style="Default", format_type="Default", reference_post=None):
+
+    """
+    Preprocess user input with style instructions.
+    Can optionally include a reference post to guide the output style.
+    Returns system + user messages for Groq API.
+    """
+    system_msg = system_instruction(tone, style, format_type)
+
+    # If a reference post is provided, create a detailed user prompt
+    if reference_post:
+        final_user_content = REFERENCE_POST_PROMPT.fill({"user_input": user_input, "reference_post": reference_post})
     else:
         final_user_content = user_input
 
     return [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": final_user_content},
-    ]
\ No newline at end of file
+    ]
+
+
+def assemble_messages(user_input, history, tone="Default", style="Default", format_type="Default",
+                      reference_post=None, layout=None):
+    """
+    Builds the full API message list: system message, prior history, then the new user turn.
+    With the stable layout the tone/style/format instruction travels at the tail of the last user message.
+    """
+    layout = layout or PROMPT_LAYOUT
+    system_msg, user_msg = build_prompt(user_input, tone, style, format_type, reference_post)
+    if layout == "classic":
+        return [system_msg] + list(history) + [user_msg]
+    content = user_msg["content"]
+    instruction = system_msg["content"]
+    if instruction != DEFAULT_SYSTEM_PROMPT:
+        content = f"{content}\n\n[Writing instructions: {instruction}]"
+    return [STABLE_SYSTEM_MESSAGE] + list(history) + [{"role": "user", "content": content}]
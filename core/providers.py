@@ -0,0 +1,323 @@
+import asyncio
+import concurrent.futures
+import inspect
+import os
+import queue
+import threading
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, List, Optional
+
+from core import scheduler as sched
+from core.context import estimate_tokens
+from core.metrics import metrics, payload_bytes
+
+if TYPE_CHECKING:
+    import httpx
+
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+CLOUDFLARE_MAX_CONCURRENCY = int(os.getenv("CLOUDFLARE_MAX_CONCURRENCY", "4"))
+CLOUDFLARE_API_BASE = os.getenv("CLOUDFLARE_API_BASE", "https://api.cloudflare.com/client/v4")
+# Process-wide quotas per provider; 0 means unlimited. Set them to the account's limits.
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "0"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "0"))
+CLOUDFLARE_REQUESTS_PER_MINUTE = float(os.getenv("CLOUDFLARE_REQUESTS_PER_MINUTE", "0"))
+DEFAULT_DEADLINE = 60.0
+WAIT_POLL_SECONDS = 0.25
+
+_loop = None
+_loop_lock = threading.Lock()
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+_chat_client = None
+_http_client = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the process-wide event loop, starting its background thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="provider-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def get_scheduler(provider: str) -> sched.ProviderScheduler:
+    """Returns the shared scheduler ("groq" or "cloudflare") that every session's calls queue on."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            if provider == "groq":
+                scheduler = sched.ProviderScheduler(provider, GROQ_MAX_CONCURRENCY, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+            else:
+                scheduler = sched.ProviderScheduler(provider, CLOUDFLARE_MAX_CONCURRENCY, CLOUDFLARE_REQUESTS_PER_MINUTE)
+            _schedulers[provider] = scheduler
+    return scheduler
+
+
+def queue_position(session_id: str) -> int:
+    """The session's place in whichever provider queue it is waiting on, or 0 if it is not waiting."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    for scheduler in schedulers:
+        position = scheduler.position(session_id)
+        if position:
+            return position
+    return 0
+
+
+def set_chat_client(client: Any):
+    """
+    Replaces the chat client used by this layer.
+    Any object exposing `chat.completions.create(...)` works; both async (AsyncGroq) and
+    sync (Groq, or an offline fake) clients are accepted; sync calls and stream reads run on
+    worker threads so they never block the shared provider loop.
+    """
+    global _chat_client
+    _chat_client = client
+
+
+def get_chat_client() -> Any:
+    global _chat_client
+    if _chat_client is None:
+        # The groq SDK is most of this package's import time, so it is loaded with the first client
+        from groq import AsyncGroq
+        # Retries are handled by core.resilience, which honours Retry-After and can fall back to another model
+        _chat_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+    return _chat_client
+
+
+def _get_http_client() -> "httpx.AsyncClient":
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient()
+    return _http_client
+
+
+class CallScope:
+    """
+    Tracks in-flight provider calls for one Streamlit session so they can be
+    cancelled together when the user reruns the script mid-request.
+    Calls submitted with a scope queue in the schedulers under its `session_id` and `priority`;
+    while such a call waits, `on_wait(queue_position)` (if set) is called from the waiting thread.
+    """
+
+    def __init__(self, session_id: str = "", priority: int = sched.INTERACTIVE):
+        self.session_id = session_id
+        self.priority = priority
+        self.on_wait = None
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def track(self, fut):
+        with self._lock:
+            self._futures.add(fut)
+        fut.add_done_callback(self._discard)
+        return fut
+
+    def cancel_all(self) -> int:
+        """Cancels every call still running and returns how many were cancelled."""
+        with self._lock:
+            pending = [fut for fut in self._futures if not fut.done()]
+            self._futures.clear()
+        for fut in pending:
+            fut.cancel()
+        return len(pending)
+
+    def _discard(self, fut):
+        with self._lock:
+            self._futures.discard(fut)
+
+
+def submit(coro, scope: Optional[CallScope] = None):
+    """Schedules `coro` on the provider loop and returns a concurrent.futures.Future."""
+    if scope is not None:
+        coro = sched.run_as(coro, scope.session_id, scope.priority)
+    fut = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    if scope is not None:
+        scope.track(fut)
+    return fut
+
+
+def _notify_wait(scope: Optional[CallScope]):
+    if scope is not None and scope.on_wait is not None:
+        scope.on_wait(queue_position(scope.session_id))
+
+
+def run_sync(coro, scope: Optional[CallScope] = None):
+    """Runs `coro` on the provider loop and blocks the calling thread for its result."""
+    fut = submit(coro, scope)
+    if scope is None or scope.on_wait is None:
+        return fut.result()
+    while True:
+        try:
+            return fut.result(timeout=WAIT_POLL_SECONDS)
+        except concurrent.futures.TimeoutError:
+            _notify_wait(scope)
+
+
+def iter_sync(agen: AsyncIterator, scope: Optional[CallScope] = None) -> Iterator:
+    """
+    Bridges an async generator running on the provider loop to a plain iterator.
+    Closing the iterator early (e.g. a Streamlit rerun) cancels the underlying call.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+            raise
+        finally:
+            items.put(done)
+
+    fut = submit(pump(), scope)
+    try:
+        while True:
+            try:
+                item = items.get(timeout=WAIT_POLL_SECONDS)
+            except queue.Empty:
+                _notify_wait(scope)
+                continue
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        if not fut.done():
+            fut.cancel()
+
+
+async def _create(client: Any, **kwargs):
+    create = client.chat.completions.create
+    if inspect.iscoroutinefunction(create):
+        return await create(**kwargs)
+    # A sync client (Groq, an offline fake) would block every session's calls on the shared loop
+    result = await asyncio.to_thread(create, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+_STREAM_END = object()
+
+
+def _next_chunk(chunks: Iterator):
+    return next(chunks, _STREAM_END)
+
+
+def _estimated_tokens(messages: List[dict], max_tokens: int) -> int:
+    """Tokens a request is charged against the tokens-per-minute bucket before the real usage is known."""
+    return sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+
+
+async def chat_completion(messages: List[dict], model: str, temperature: float, max_tokens: int,
+                          deadline: float = DEFAULT_DEADLINE, client: Any = None, action: str = "chat") -> str:
+    """
+    Runs one chat completion once the Groq scheduler admits it, under a deadline in seconds.
+    Queue time, latency, token counts and payload sizes are recorded under `action`.
+    """
+    client = client or get_chat_client()
+    call = metrics.start("groq", model, action, payload_bytes(messages))
+    try:
+        async with get_scheduler("groq").slot(_estimated_tokens(messages, max_tokens)) as ticket:
+            call.acquired()
+            response = await asyncio.wait_for(
+                _create(client, model=model, messages=messages, temperature=temperature, max_tokens=max_tokens),
+                timeout=deadline,
+            )
+        text = response.choices[0].message.content.strip()
+    except BaseException as e:
+        call.finish(e)
+        raise
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        call.prompt_tokens = usage.prompt_tokens
+        call.completion_tokens = usage.completion_tokens
+        ticket.settle(usage.prompt_tokens + usage.completion_tokens)
+    call.response_bytes = len(text.encode("utf-8"))
+    call.finish()
+    return text
+
+
+def _observe_chunk(call, chunk):
+    # Groq reports exact usage on the final chunk under `x_groq`
+    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    if usage is not None:
+        call.prompt_tokens = usage.prompt_tokens
+        call.completion_tokens = usage.completion_tokens
+    delta = chunk.choices[0].delta.content if chunk.choices else None
+    if delta:
+        call.first_token()
+        call.response_bytes += len(delta.encode("utf-8"))
+
+
+async def stream_chat(messages: List[dict], model: str, temperature: float, max_tokens: int,
+                      deadline: float = DEFAULT_DEADLINE, client: Any = None, action: str = "chat") -> AsyncIterator:
+    """
+    Streams a chat completion, yielding the raw chunks.
+    The scheduler slot is held for the whole stream and `deadline` bounds the total time.
+    A stream closed early by the consumer is recorded as cancelled.
+    """
+    client = client or get_chat_client()
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    call = metrics.start("groq", model, action, payload_bytes(messages))
+    try:
+        async with get_scheduler("groq").slot(_estimated_tokens(messages, max_tokens)) as ticket:
+            call.acquired()
+            stream = await asyncio.wait_for(
+                _create(client, model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, stream=True),
+                timeout=deadline,
+            )
+            if not hasattr(stream, "__aiter__"):
+                # Sync streams are read on a worker thread, one chunk at a time, under the same deadline
+                chunks = iter(stream)
+                while True:
+                    chunk = await asyncio.wait_for(asyncio.to_thread(_next_chunk, chunks), timeout=max(end - loop.time(), 0))
+                    if chunk is _STREAM_END:
+                        break
+                    _observe_chunk(call, chunk)
+                    yield chunk
+            else:
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(end - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    _observe_chunk(call, chunk)
+                    yield chunk
+            if call.completion_tokens is not None:
+                ticket.settle((call.prompt_tokens or 0) + call.completion_tokens)
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+
+async def generate_image(url: str, headers: dict, payload: dict, deadline: float = DEFAULT_DEADLINE,
+                         model: str = "image", action: str = "image") -> "httpx.Response":
+    """
+    POSTs an image generation request once the Cloudflare scheduler admits it, under a deadline.
+    Non-2xx responses are returned to the caller but recorded as errors (e.g. "http_429").
+    """
+    call = metrics.start("cloudflare", model, action, payload_bytes(payload))
+    try:
+        async with get_scheduler("cloudflare").slot():
+            call.acquired()
+            resp = await asyncio.wait_for(
+                _get_http_client().post(url, headers=headers, json=payload, timeout=deadline),
+                timeout=deadline,
+            )
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.response_bytes = len(resp.content)
+    call.finish(None if resp.status_code < 400 else f"http_{resp.status_code}")
+    return resp
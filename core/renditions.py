@@ -0,0 +1,69 @@
+import io
+import os
+from typing import Optional
+
+from PIL import Image  # required (requirements.txt); this module is only imported once image mode is used
+
+from core.blobs import BlobStore
+
+THUMBNAIL_SIDE = 256
+DISPLAY_SIDE = int(os.getenv("IMAGE_DISPLAY_SIDE", "768"))
+DISPLAY_FORMAT = os.getenv("IMAGE_DISPLAY_FORMAT", "WEBP").upper()  # WEBP or JPEG
+DISPLAY_QUALITY = int(os.getenv("IMAGE_DISPLAY_QUALITY", "80"))
+# rendition kind -> longest side in pixels
+RENDITIONS = {"thumb": THUMBNAIL_SIDE, "display": DISPLAY_SIDE}
+# Stored under a rendition key when no smaller rendition can be made, so views serve the original without retrying
+USE_ORIGINAL = b""
+
+
+def rendition_key(key: str, kind: str) -> str:
+    return f"{key}.{kind}"
+
+
+def encode_rendition(data: bytes, max_side: int, fmt: str = DISPLAY_FORMAT, quality: int = DISPLAY_QUALITY) -> Optional[bytes]:
+    """
+    Downscales an image so its longest side is at most `max_side` and re-encodes it.
+    Returns None when the image cannot be decoded or encoded.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail((max_side, max_side))
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format=fmt, quality=quality)
+            return out.getvalue()
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _make_renditions(store: BlobStore, key: str, data: bytes, kinds=RENDITIONS):
+    for kind in kinds:
+        rendition = encode_rendition(data, RENDITIONS[kind])
+        # A rendition that is not smaller than the original is pointless; the original is served instead
+        if rendition is None or len(rendition) >= len(data):
+            rendition = USE_ORIGINAL
+        store.put(rendition, key=rendition_key(key, kind))
+
+
+def ingest_image(store: BlobStore, data: bytes) -> str:
+    """Stores a generated image and its thumbnail/display renditions; returns the original's key."""
+    key = store.put(data)
+    _make_renditions(store, key, data)
+    return key
+
+
+def get_rendition(store: BlobStore, key: str, kind: str) -> Optional[bytes]:
+    """
+    Returns the `kind` rendition ("thumb" or "display") of a stored image, or the original
+    when no smaller rendition can be made. A missing rendition (an image stored before ingest
+    processing, or one lost from the store) is rebuilt once on view. Returns None if the image is gone.
+    """
+    data = store.get(rendition_key(key, kind))
+    if data is None:
+        original = store.get(key)
+        if original is None:
+            return None
+        _make_renditions(store, key, original, (kind,))
+        data = store.get(rendition_key(key, kind))
+    return data or store.get(key)
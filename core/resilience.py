@@ -0,0 +1,298 @@
+import asyncio
+import email.utils
+import os
+import random
+import sys
+import threading
+import time
+from typing import AsyncIterator, List, Optional, Sequence
+
+from core import providers
+
+MAX_ATTEMPTS = int(os.getenv("GENERATION_MAX_ATTEMPTS", "3"))  # per model
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Time to the first token (or to the full reply for non-streaming calls) a model should stay under
+LATENCY_SLO_SECONDS = float(os.getenv("LATENCY_SLO_SECONDS", "10"))
+SLO_EWMA_WEIGHT = 0.3
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class GenerationError(RuntimeError):
+    """
+    A text generation request that failed after retries and fallbacks.
+    Raised instead of returning an error string, so a failure is never stored as a reply.
+    """
+
+    def __init__(self, message: str, model: Optional[str] = None, status: Optional[int] = None,
+                 retryable: bool = False):
+        super().__init__(message)
+        self.model = model
+        self.status = status
+        self.retryable = retryable
+
+
+class CircuitOpenError(GenerationError):
+    """Every candidate model has its circuit breaker open."""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (Retry-After / retry-after-ms headers), if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Neither seconds nor an HTTP date: fall back to the usual backoff
+        return None
+    return max(parsed.timestamp() - time.time(), 0.0)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, server errors, timeouts and connection failures are retried; bad requests are not."""
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, _connection_errors())
+
+
+def _connection_errors() -> tuple:
+    # httpx and groq are imported lazily; an error type can only occur once its library is loaded
+    errors = [TimeoutError, ConnectionError]
+    for module, name in (("httpx", "TransportError"), ("groq", "APIConnectionError")):
+        if module in sys.modules:
+            errors.append(getattr(sys.modules[module], name))
+    return tuple(errors)
+
+
+def backoff_delay(attempt: int, retry_after_seconds: Optional[float] = None, rng=random) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After."""
+    delay = rng.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after_seconds) if retry_after_seconds else delay
+
+
+def to_generation_error(error: BaseException, model: Optional[str]) -> GenerationError:
+    if isinstance(error, GenerationError):
+        return error
+    if isinstance(error, TimeoutError):
+        message = f"{model} did not answer in time"
+    else:
+        message = f"{model}: {type(error).__name__}: {error}"
+    return GenerationError(message, model=model, status=status_code(error), retryable=is_retryable(error))
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker. Opens after BREAKER_FAILURES consecutive retryable failures; once
+    BREAKER_RESET_SECONDS have passed one probe call is let through and a success closes it.
+    Also tracks an EWMA of latency; a model over LATENCY_SLO_SECONDS is marked slow for one
+    reset period so requests prefer the fallback.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.failures = 0
+        self.opened_at = None
+        self.latency_ewma = None
+        self.slow_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    @property
+    def is_slow(self) -> bool:
+        return time.monotonic() < self.slow_until
+
+    def available(self) -> bool:
+        """True when a call would be allowed right now (closed, or open and due for a probe)."""
+        return self.opened_at is None or time.monotonic() - self.opened_at >= BREAKER_RESET_SECONDS
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < BREAKER_RESET_SECONDS:
+                return False
+            self.opened_at = now  # half-open: one probe per reset period
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += SLO_EWMA_WEIGHT * (latency - self.latency_ewma)
+            if self.latency_ewma > LATENCY_SLO_SECONDS:
+                self.slow_until = time.monotonic() + BREAKER_RESET_SECONDS
+                self.latency_ewma = None  # re-measured from scratch once the slow period ends
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= BREAKER_FAILURES:
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"model": self.model, "open": self.is_open, "slow": self.is_slow,
+                "failures": self.failures, "latency_ewma": self.latency_ewma}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        br = _breakers.get(model)
+        if br is None:
+            br = _breakers[model] = CircuitBreaker(model)
+    return br
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def route_models(models: Sequence[str]) -> List[str]:
+    """Candidate models in preference order: open breakers are skipped, slow models go last."""
+    candidates = [m for m in models if breaker(m).available()]
+    return sorted(candidates, key=lambda m: breaker(m).is_slow)
+
+
+class Route:
+    """Filled in by `complete` / `stream`: which model answered and how many attempts it took."""
+
+    __slots__ = ("model", "attempts")
+
+    def __init__(self):
+        self.model = None
+        self.attempts = 0
+
+
+async def _retry_pause(error, attempt, end, loop) -> bool:
+    """Sleeps before the next attempt on the same model; returns False to move on to the next model."""
+    if attempt + 1 >= MAX_ATTEMPTS:
+        return False
+    delay = backoff_delay(attempt, retry_after(error))
+    if delay >= end - loop.time():
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+async def complete(messages: List[dict], models: Sequence[str], temperature: float, max_tokens: int,
+                   action: str = "chat", deadline: float = providers.DEFAULT_DEADLINE, client=None,
+                   route: Optional[Route] = None) -> str:
+    """
+    Runs a chat completion with retries, per-model circuit breakers and fallback across `models`.
+    Raises GenerationError when every model is exhausted or the error is not retryable.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    route = route or Route()
+    last_error, last_model = None, None
+    for model in route_models(models):
+        br = breaker(model)
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = end - loop.time()
+            if remaining <= 0 or not br.allow():
+                break
+            route.attempts += 1
+            start = loop.time()
+            try:
+                text = await providers.chat_completion(messages, model, temperature, max_tokens,
+                                                       deadline=remaining, client=client, action=action)
+            except Exception as e:
+                last_error, last_model = e, model
+                if not is_retryable(e):
+                    raise to_generation_error(e, model) from e
+                br.record_failure()
+                if not await _retry_pause(e, attempt, end, loop):
+                    break
+                continue
+            br.record_success(loop.time() - start)
+            route.model = model
+            return text
+    if last_error is None:
+        raise CircuitOpenError("All models are temporarily unavailable, please try again shortly", retryable=True)
+    raise to_generation_error(last_error, last_model) from last_error
+
+
+async def stream(messages: List[dict], models: Sequence[str], temperature: float, max_tokens: int,
+                 action: str = "chat", deadline: float = providers.DEFAULT_DEADLINE, client=None,
+                 route: Optional[Route] = None) -> AsyncIterator:
+    """
+    Streaming counterpart of `complete`, yielding raw chunks.
+    Failures before the first token are retried or fall back; once tokens have been yielded a
+    failure raises GenerationError, since a partial reply cannot be resumed on another attempt.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    route = route or Route()
+    last_error, last_model = None, None
+    for model in route_models(models):
+        br = breaker(model)
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = end - loop.time()
+            if remaining <= 0 or not br.allow():
+                break
+            route.attempts += 1
+            start = loop.time()
+            started = False
+            chunks = providers.stream_chat(messages, model, temperature, max_tokens,
+                                           deadline=remaining, client=client, action=action)
+            try:
+                async for chunk in chunks:
+                    if not started and chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        route.model = model
+                        br.record_success(loop.time() - start)
+                    yield chunk
+            except Exception as e:
+                last_error, last_model = e, model
+                if started or not is_retryable(e):
+                    if is_retryable(e):
+                        br.record_failure()
+                    raise to_generation_error(e, model) from e
+                br.record_failure()
+                if not await _retry_pause(e, attempt, end, loop):
+                    break
+                continue
+            finally:
+                await chunks.aclose()
+            if not started:
+                route.model = model
+                br.record_success(loop.time() - start)
+            return
+    if last_error is None:
+        raise CircuitOpenError("All models are temporarily unavailable, please try again shortly", retryable=True)
+    raise to_generation_error(last_error, last_model) from last_error
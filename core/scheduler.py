@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+# Token buckets hold this many seconds' worth of their per-minute rate, bounding bursts
+BURST_SECONDS = 10.0
+
+# (session id, priority) of the code running on the provider loop; set per call by providers.submit
+_identity = contextvars.ContextVar("scheduler_identity", default=("", INTERACTIVE))
+
+
+def current_identity():
+    return _identity.get()
+
+
+async def run_as(coro, session_id: Optional[str] = None, priority: Optional[int] = None):
+    """Runs `coro` with the given session id and/or priority; tasks it spawns inherit them."""
+    current_session, current_priority = _identity.get()
+    token = _identity.set((current_session if session_id is None else session_id,
+                           current_priority if priority is None else priority))
+    try:
+        return await coro
+    finally:
+        _identity.reset(token)
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units per second up to `capacity` (default: BURST_SECONDS worth).
+    A request larger than the capacity is let through once the bucket is full and leaves it in
+    debt, so oversized requests are delayed rather than blocked forever.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, n: float) -> float:
+        """Seconds until `n` units can be taken (0 if they can be taken now)."""
+        self._refill()
+        missing = min(n, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def available(self) -> float:
+        """Units that can be taken right now (negative while in debt)."""
+        self._refill()
+        return self.tokens
+
+    def take(self, n: float):
+        self._refill()
+        self.tokens -= n
+
+    def refund(self, n: float):
+        """Returns (or, with a negative `n`, charges) units after the true cost is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + n)
+
+
+class Ticket:
+    """One queued call: who asked, at which priority, and its estimated token cost."""
+
+    __slots__ = ("session", "priority", "tokens", "future", "scheduler")
+
+    def __init__(self, scheduler, session: str, priority: int, tokens: int, future):
+        self.scheduler = scheduler
+        self.session = session
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+
+    def settle(self, actual_tokens: Optional[int]):
+        """Corrects the tokens-per-minute bucket once the provider has reported the real usage."""
+        if actual_tokens is not None:
+            self.scheduler.settle(self, actual_tokens)
+
+
+class ProviderScheduler:
+    """
+    Process-wide admission control for one provider.
+    A call waits for a concurrency slot and for room in the requests- and tokens-per-minute
+    buckets. Waiting calls are served interactive before bulk, and round-robin across sessions
+    within a priority, so one busy session cannot starve the others.
+    Runs on the provider event loop; `position` and `stats` may be called from any thread.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = 0
+        self.granted = 0
+        self.throttled_seconds = 0.0
+        # priority -> OrderedDict(session -> deque of tickets); dict order is the round-robin order
+        self._queues = {INTERACTIVE: OrderedDict(), BULK: OrderedDict()}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Waits for admission for the current session/priority, yielding the granted Ticket."""
+        session, priority = current_identity()
+        ticket = Ticket(self, session, priority, tokens, asyncio.get_running_loop().create_future())
+        with self._lock:
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+        self._pump()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = self._discard(ticket)
+            if granted:
+                self._release()
+            raise
+        try:
+            yield ticket
+        finally:
+            self._release()
+
+    def settle(self, ticket: Ticket, actual_tokens: int):
+        if self.token_bucket is not None:
+            with self._lock:
+                self.token_bucket.refund(ticket.tokens - actual_tokens)
+
+    def position(self, session: str) -> int:
+        """1-based place of the session's next waiting call in the service order, or 0 if none is waiting."""
+        with self._lock:
+            for place, ticket in enumerate(self._service_order(), 1):
+                if ticket.session == session:
+                    return place
+        return 0
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting(),
+            "granted": self.granted,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+    def _peek(self) -> Optional[Ticket]:
+        for priority in (INTERACTIVE, BULK):
+            queues = self._queues[priority]
+            if queues:
+                return next(iter(queues.values()))[0]
+        return None
+
+    def _service_order(self):
+        # Interactive first; within a priority, one ticket per session per round
+        for priority in (INTERACTIVE, BULK):
+            queues = [list(q) for q in self._queues[priority].values()]
+            depth = max((len(q) for q in queues), default=0)
+            for i in range(depth):
+                for q in queues:
+                    if i < len(q):
+                        yield q[i]
+
+    def _discard(self, ticket: Ticket) -> bool:
+        """Removes a cancelled ticket; returns True if it had already been granted a slot."""
+        queues = self._queues[ticket.priority]
+        pending = queues.get(ticket.session)
+        if pending is not None and ticket in pending:
+            pending.remove(ticket)
+            if not pending:
+                del queues[ticket.session]
+            return False
+        return ticket.future.done() and not ticket.future.cancelled()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._pump()
+
+    def _pump(self):
+        with self._lock:
+            while self.in_flight < self.max_concurrency:
+                ticket = self._peek()
+                if ticket is None:
+                    return
+                wait = 0.0
+                if self.request_bucket is not None:
+                    wait = self.request_bucket.wait_time(1)
+                if self.token_bucket is not None:
+                    wait = max(wait, self.token_bucket.wait_time(ticket.tokens))
+                if wait > 0:
+                    if self._timer is None:
+                        self.throttled_seconds += wait
+                        self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                    return
+                queues = self._queues[ticket.priority]
+                pending = queues[ticket.session]
+                pending.popleft()
+                if pending:
+                    queues.move_to_end(ticket.session)
+                else:
+                    del queues[ticket.session]
+                if ticket.future.done():
+                    continue
+                if self.request_bucket is not None:
+                    self.request_bucket.take(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.take(ticket.tokens)
+                self.in_flight += 1
+                self.granted += 1
+                ticket.future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._pump()
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+# Rows are (seq, role, content, msg_type, created)
+Row = Tuple[int, str, str, str, float]
+
+TAIL_MESSAGES = 200
+COMPACT_AFTER_EDITS = 16
+
+
+class SessionBackend(ABC):
+    """
+    Interface for persisting chat history, one append-only log per session.
+    MessageStore calls append/edit/clear as the history changes; only the changed turn is written.
+    A subclass missing any of the abstract methods fails when it is instantiated.
+    """
+
+    @abstractmethod
+    def append(self, session_id: str, seq: int, role: str, content: str, msg_type: str, created: float):
+        ...
+
+    @abstractmethod
+    def edit(self, session_id: str, seq: int, content: str):
+        ...
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def count(self, session_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def load(self, session_id: str, start: int, end: int) -> List[Row]:
+        """Returns the current state of messages with start <= seq < end, oldest first."""
+        ...
+
+    def load_tail(self, session_id: str, limit: int = TAIL_MESSAGES) -> Tuple[int, List[Row]]:
+        """Returns (first_seq, rows) for the newest `limit` messages of a session."""
+        total = self.count(session_id)
+        start = max(total - limit, 0)
+        return start, self.load(session_id, start, total)
+
+    def put_blob(self, key: str, data: bytes):
+        """
+        Durably stores a content-addressed blob (e.g. an image a message refers to).
+        Backends that cannot hold blobs leave images to the local BlobStore spill directory.
+        """
+
+    def get_blob(self, key: str) -> Optional[bytes]:
+        return None
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    SQLite-backed session log. New turns and edits are appended as rows; edits are folded
+    into their original turn (and superseded rows deleted) once COMPACT_AFTER_EDITS pile up
+    or the session is cleared.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_log ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT NOT NULL, seq INTEGER NOT NULL, "
+            "op TEXT NOT NULL, role TEXT, content TEXT, type TEXT, created REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS session_log_seq ON session_log (session, seq)")
+        # Images referenced by IMGREF::/IMGSET:: messages, so reopened sessions can show them on any replica
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self._db.commit()
+
+    def append(self, session_id, seq, role, content, msg_type, created):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO session_log (session, seq, op, role, content, type, created) VALUES (?, ?, 'add', ?, ?, ?, ?)",
+                (session_id, seq, role, content, msg_type, created),
+            )
+            self._db.commit()
+
+    def edit(self, session_id, seq, content):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO session_log (session, seq, op, content) VALUES (?, ?, 'edit', ?)",
+                (session_id, seq, content),
+            )
+            edits = self._db.execute(
+                "SELECT COUNT(*) FROM session_log WHERE session = ? AND op = 'edit'", (session_id,)
+            ).fetchone()[0]
+            if edits >= COMPACT_AFTER_EDITS:
+                self._compact(session_id)
+            self._db.commit()
+
+    def clear(self, session_id):
+        # Nothing before a clear is ever read again, so the whole log is dropped
+        with self._lock:
+            self._db.execute("DELETE FROM session_log WHERE session = ?", (session_id,))
+            self._db.commit()
+
+    def put_blob(self, key, data):
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO blobs (key, data) VALUES (?, ?)", (key, data))
+            self._db.commit()
+
+    def get_blob(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def compact(self, session_id: str):
+        """Folds pending edits into their turns and deletes the superseded rows."""
+        with self._lock:
+            self._compact(session_id)
+            self._db.commit()
+
+    def count(self, session_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(seq) FROM session_log WHERE session = ? AND op = 'add'", (session_id,)
+            ).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def load(self, session_id, start, end):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, op, role, content, type, created FROM session_log "
+                "WHERE session = ? AND seq >= ? AND seq < ? ORDER BY id",
+                (session_id, start, end),
+            ).fetchall()
+        turns = {}
+        for seq, op, role, content, msg_type, created in rows:
+            if op == "add":
+                turns[seq] = [seq, role, content, msg_type, created]
+            elif seq in turns:
+                turns[seq][2] = content
+        return [tuple(turns[seq]) for seq in sorted(turns)]
+
+    def _compact(self, session_id):
+        edits = self._db.execute(
+            "SELECT id, seq, content FROM session_log WHERE session = ? AND op = 'edit' ORDER BY id", (session_id,)
+        ).fetchall()
+        latest = {}
+        for _, seq, content in edits:
+            latest[seq] = content
+        self._db.executemany(
+            "UPDATE session_log SET content = ? WHERE session = ? AND seq = ? AND op = 'add'",
+            [(content, session_id, seq) for seq, content in latest.items()],
+        )
+        if edits:
+            self._db.execute(
+                "DELETE FROM session_log WHERE session = ? AND op = 'edit' AND id <= ?", (session_id, edits[-1][0])
+            )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_session_backend() -> Optional[SessionBackend]:
+    """
+    Returns the process-wide session backend, or None when persistence is off.
+    Set SESSION_DB_PATH to a SQLite file to keep history across restarts and replicas.
+    """
+    global _backend
+    path = os.getenv("SESSION_DB_PATH")
+    if not path:
+        return None
+    with _backend_lock:
+        if _backend is None:
+            _backend = SQLiteSessionBackend(path)
+    return _backend
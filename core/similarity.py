@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+SHINGLE_SIZE = 5  # characters per shingle
+NUM_PERM = 64
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows; pairs above ~0.5 similarity almost always share a band
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+SIMILARITY_MAX_ENTRIES = int(os.getenv("SIMILARITY_MAX_ENTRIES", "2000"))
+# Set SIMILARITY_WORKSPACE to let everyone using this deployment reuse each other's past replies;
+# otherwise signed-in users (st.login) reuse their own across sessions, and anonymous visitors
+# only within one conversation (a persisted one is reopened via ?sid=)
+SIMILARITY_WORKSPACE = os.getenv("SIMILARITY_WORKSPACE")
+# Short follow-ups ("make it shorter", "continue") depend on the conversation, not their wording
+MIN_PROMPT_CHARS = 40
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures persisted by one process must stay comparable in the next
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_ROWS = NUM_PERM // BANDS
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def shingles(text: str) -> set:
+    """64-bit hashes of the overlapping SHINGLE_SIZE-character pieces of the normalized text."""
+    text = normalize(text)
+    pieces = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+    return {int.from_bytes(hashlib.blake2b(p.encode("utf-8"), digest_size=8).digest(), "big") for p in pieces}
+
+
+def signature(text: str) -> Tuple[int, ...]:
+    """MinHash signature; the share of equal positions in two signatures estimates their Jaccard similarity."""
+    hashes = shingles(text)
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _bands(sig: Sequence[int]):
+    for band in range(BANDS):
+        yield band, hash(tuple(sig[band * _ROWS:(band + 1) * _ROWS]))
+
+
+def request_namespace(namespace: str, instruction: str, reference_post: Optional[str] = None) -> str:
+    """
+    Narrows `namespace` to requests sent with the same writing instruction (tone/style/format)
+    and reference post, so a reply written as an email is never offered for a tweet.
+    """
+    digest = hashlib.sha256(f"{instruction}\0{reference_post or ''}".encode("utf-8")).hexdigest()[:16]
+    return f"{namespace}|{digest}"
+
+
+class Match(NamedTuple):
+    prompt: str
+    response: str
+    score: float
+
+
+class SimilarityIndex:
+    """
+    Bounded near-duplicate index over past (prompt, response) pairs.
+    Prompts are MinHash-signed and bucketed with LSH, so a lookup only compares against likely
+    matches. Entries are partitioned by `namespace` (a user, workspace or conversation), hold at most
+    `max_entries` in total with least-recently-used eviction, and are mirrored to an optional
+    SQLite file so the index survives restarts.
+    """
+
+    def __init__(self, max_entries: int = SIMILARITY_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (namespace, prompt, response, signature)
+        self._buckets = {}  # (namespace, band, band hash) -> set of keys
+        self._lock = threading.Lock()
+        self._db = None
+        self.lookups = 0
+        self.matches = 0
+        self.reused = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS similar_prompts ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, prompt TEXT NOT NULL, response TEXT NOT NULL, "
+                "signature TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, namespace, prompt, response, signature FROM similar_prompts ORDER BY accessed DESC LIMIT ?",
+                (max_entries,),
+            ).fetchall()
+            for key, namespace, prompt, response, sig in reversed(rows):
+                self._remember(key, namespace, prompt, response, tuple(json.loads(sig)))
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{normalize(prompt)}".encode("utf-8")).hexdigest()[:32]
+
+    def add(self, namespace: str, prompt: str, response: str) -> Optional[str]:
+        """
+        Indexes a prompt and the response kept for it; re-adding a prompt replaces its response.
+        Prompts shorter than MIN_PROMPT_CHARS are not indexed and None is returned.
+        """
+        if len(normalize(prompt)) < MIN_PROMPT_CHARS:
+            return None
+        key = self.make_key(namespace, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == response:
+                # Already indexed (e.g. a reused reply kept again)
+                self._entries.move_to_end(key)
+                return key
+        sig = signature(prompt)
+        with self._lock:
+            self._forget(key)
+            self._remember(key, namespace, prompt, response, sig)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO similar_prompts (key, namespace, prompt, response, signature, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, namespace, prompt, response, json.dumps(sig), time.time()),
+                )
+                self._db.execute(
+                    "DELETE FROM similar_prompts WHERE key IN ("
+                    "SELECT key FROM similar_prompts ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+        return key
+
+    def query(self, namespace: str, prompt: str, threshold: float = SIMILARITY_THRESHOLD, limit: int = 3) -> List[Match]:
+        """Past pairs in `namespace` whose prompt is at least `threshold` similar to `prompt`, best first."""
+        if len(normalize(prompt)) < MIN_PROMPT_CHARS:
+            return []
+        sig = signature(prompt)
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for band, digest in _bands(sig):
+                candidates |= self._buckets.get((namespace, band, digest), set())
+            found, hit_keys = [], []
+            for key in candidates:
+                _, old_prompt, response, old_sig = self._entries[key]
+                score = similarity(sig, old_sig)
+                if score >= threshold:
+                    found.append(Match(old_prompt, response, score))
+                    self._entries.move_to_end(key)
+                    hit_keys.append(key)
+            if found:
+                self.matches += 1
+                if self._db is not None:
+                    # Keep the on-disk LRU order in step with the in-memory one
+                    now = time.time()
+                    self._db.executemany("UPDATE similar_prompts SET accessed = ? WHERE key = ?", [(now, k) for k in hit_keys])
+                    self._db.commit()
+        found.sort(key=lambda m: m.score, reverse=True)
+        return found[:limit]
+
+    def record_reuse(self):
+        """Counts a match the user accepted instead of generating."""
+        with self._lock:
+            self.reused += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM similar_prompts")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "lookups": self.lookups, "matches": self.matches, "reused": self.reused}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key, namespace, prompt, response, sig):
+        self._entries[key] = (namespace, prompt, response, sig)
+        for band, digest in _bands(sig):
+            self._buckets.setdefault((namespace, band, digest), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        namespace, _, _, sig = entry
+        for band, digest in _bands(sig):
+            bucket = self._buckets.get((namespace, band, digest))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(namespace, band, digest)]
+
+
+class HistoryIndexer:
+    """
+    MessageStore listener that indexes every user prompt answered directly by an assistant
+    reply, and re-indexes the pair when that reply is regenerated or edited.
+    A pair is indexed under `namespace` as it stands when the reply arrives (see request_namespace);
+    turns loaded from a session backend were indexed when they were written, under the settings
+    they were sent with, which the log does not keep, so they are not indexed again.
+    """
+
+    def __init__(self, index: SimilarityIndex, namespace: str, live_from: int = 0):
+        self.index = index
+        self.namespace = namespace
+        self._live_from = live_from  # first position written in this session rather than loaded
+        self._unanswered = {}  # user prompt position -> prompt, until the turn after it arrives
+        self._prompts = {}  # reply position -> (prompt it answers, namespace it was indexed under)
+
+    @classmethod
+    def attach(cls, store: Any, index: SimilarityIndex, namespace: str) -> "HistoryIndexer":
+        """Creates an indexer for the turns `store` gains from now on."""
+        indexer = cls(index, namespace, live_from=len(store))
+        store.listeners.append(indexer)
+        return indexer
+
+    def added(self, idx: int, msg: Any):
+        # Whatever follows a prompt settles it, so only a prompt still awaiting its next turn is held
+        prompt = self._unanswered.pop(idx - 1, None)
+        if idx < self._live_from or msg["type"] != "text":
+            return
+        if msg["role"] == "user":
+            self._unanswered[idx] = msg["content"]
+            return
+        if msg["role"] == "assistant" and prompt is not None:
+            self._prompts[idx] = (prompt, self.namespace)
+            self.index.add(self.namespace, prompt, msg["content"])
+
+    def updated(self, idx: int, old_content: str, msg: Any):
+        entry = self._prompts.get(idx)
+        if entry is not None:
+            prompt, namespace = entry
+            self.index.add(namespace, prompt, msg["content"])
+
+    def cleared(self):
+        # Past pairs stay indexed: a cleared chat is exactly where an old prompt gets resubmitted
+        self._live_from = 0
+        self._unanswered.clear()
+        self._prompts.clear()
+
+
+# Set SIMILARITY_DB_PATH to a file path to keep the index across restarts
+similarity_index = SimilarityIndex(db_path=os.getenv("SIMILARITY_DB_PATH"))
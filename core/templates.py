@@ -1,3 +1,9 @@
+import json
+import os
+import string
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 PROMPT_TEMPLATES = {
     "Marketing & Business": {
         "Product Description": {
@@ -138,19 +144,169 @@ PROMPT_TEMPLATES = {
     }
 }
 
+# Placeholders every template accepts that are not part of the template text
+OPTIONAL_PLACEHOLDERS = ("previous_post_reference",)
+
+
+class TemplateFieldError(ValueError):
+    """Raised when template values are missing or unexpected; lists every offending field."""
+
+    def __init__(self, missing, extra=()):
+        self.missing = sorted(missing)
+        self.extra = sorted(extra)
+        problems = []
+        if self.missing:
+            problems.append("missing value for " + ", ".join(repr(f) for f in self.missing))
+        if self.extra:
+            problems.append("unexpected " + ", ".join(repr(f) for f in self.extra))
+        super().__init__("; ".join(problems))
+
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal/field segments.
+    `fields` is extracted from the text itself, so it can never drift from it.
+    """
+
+    __slots__ = ("text", "fields", "_segments", "_simple")
+
+    def __init__(self, text: str):
+        self.text = text
+        segments = []
+        order = []
+        simple = True
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field is not None:
+                if spec or conversion or not field.isidentifier():
+                    simple = False
+                if field not in order:
+                    order.append(field)
+            segments.append((literal, field))
+        self.fields = tuple(order)
+        self._segments = tuple(segments)
+        self._simple = simple
+
+    def validate(self, values: dict) -> None:
+        """Raises TemplateFieldError naming every missing and extra field. None counts as missing."""
+        given = {k for k, v in values.items() if v is not None}
+        missing = set(self.fields) - given
+        extra = given - set(self.fields) - set(OPTIONAL_PLACEHOLDERS)
+        if missing or extra:
+            raise TemplateFieldError(missing, extra)
+
+    def fill(self, values: dict) -> str:
+        """Fills the template; raises KeyError on a missing field. Extra values are ignored."""
+        if not self._simple:
+            return self.text.format(**values)
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append(value if type(value) is str else format(value))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=512)
+def compile_template(template_text: str) -> CompiledTemplate:
+    """Returns the compiled form of a template string, compiling each distinct text once."""
+    return CompiledTemplate(template_text)
+
+
+class TemplateRegistry:
+    """Templates indexed by (category, name) and by placeholder."""
+
+    def __init__(self):
+        self._categories: Dict[str, Dict[str, dict]] = {}
+        self._compiled: Dict[tuple, CompiledTemplate] = {}
+        self._by_placeholder: Dict[str, List[tuple]] = {}
+
+    def register(self, category: str, name: str, data: dict):
+        """Adds (or replaces) a template. Its placeholder list is derived from the template text."""
+        compiled = compile_template(data["template"])
+        entry = dict(data)
+        entry["placeholders"] = list(compiled.fields) + list(OPTIONAL_PLACEHOLDERS)
+        key = (category, name)
+        if key in self._compiled:
+            for field in self._compiled[key].fields:
+                self._by_placeholder[field].remove(key)
+        self._categories.setdefault(category, {})[name] = entry
+        self._compiled[key] = compiled
+        for field in compiled.fields:
+            self._by_placeholder.setdefault(field, []).append(key)
+
+    def register_all(self, templates: Dict[str, Dict[str, dict]]) -> int:
+        count = 0
+        for category, entries in templates.items():
+            for name, data in entries.items():
+                self.register(category, name, data)
+                count += 1
+        return count
+
+    def load_pack(self, path: str) -> int:
+        """
+        Loads extra templates from a JSON or YAML file shaped like PROMPT_TEMPLATES
+        ({category: {name: {"template": ..., "description": ...}}}). Returns how many were added.
+        """
+        with open(path, encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError("PyYAML is required to load YAML template packs (pip install pyyaml).")
+                templates = yaml.safe_load(f)
+            else:
+                templates = json.load(f)
+        return self.register_all(templates or {})
+
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def in_category(self, category: str) -> Dict[str, dict]:
+        return self._categories.get(category, {})
+
+    def get(self, category: str, name: str) -> dict:
+        return self._categories.get(category, {}).get(name, {})
+
+    def compiled(self, category: str, name: str) -> Optional[CompiledTemplate]:
+        return self._compiled.get((category, name))
+
+    def with_placeholder(self, placeholder: str) -> List[tuple]:
+        """Returns the (category, name) keys of every template that uses `placeholder`."""
+        return list(self._by_placeholder.get(placeholder, []))
+
+
+_registry = None
+
+
+def get_registry() -> TemplateRegistry:
+    """
+    Returns the template registry, building it on first use.
+    Extra packs listed in TEMPLATE_PACKS (paths separated by os.pathsep) are loaded at that point.
+    """
+    global _registry
+    if _registry is None:
+        registry = TemplateRegistry()
+        registry.register_all(PROMPT_TEMPLATES)
+        for path in filter(None, os.getenv("TEMPLATE_PACKS", "").split(os.pathsep)):
+            registry.load_pack(path)
+        _registry = registry
+    return _registry
+
 def get_template_categories():
-    return list(PROMPT_TEMPLATES.keys())
+    return get_registry().categories()
 
 def get_templates_in_category(category):
-    return PROMPT_TEMPLATES.get(category, {})
+    return get_registry().in_category(category)
 
 def get_template_data(category, template_name):
-    return PROMPT_TEMPLATES.get(category, {}).get(template_name, {})
+    return get_registry().get(category, template_name)
 
 def fill_template(template_text, **kwargs):
-    try:
-        # Filter out None values before formatting
-        valid_kwargs = {k: v for k, v in kwargs.items() if v is not None}
-        return template_text.format(**valid_kwargs)
-    except KeyError as e:
-        return f"Error: Missing value for {e}"
\ No newline at end of file
+    # Filter out None values before formatting
+    valid_kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    compiled = compile_template(template_text)
+    missing = [f for f in compiled.fields if f not in valid_kwargs]
+    if missing:
+        return f"Error: Missing value for {', '.join(repr(f) for f in missing)}"
+    return compiled.fill(valid_kwargs)
@@ -0,0 +1,176 @@
+import json
+import re
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+WORDS_PER_MINUTE = 238
+# format -> (unit, limit); "chars" counts every character, as the platforms do
+FORMAT_LIMITS = {
+    "tweet": ("chars", 280),
+    "linkedin": ("chars", 3000),
+    "email": ("words", 200),
+}
+
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+_ALPHA_WORD = re.compile(r"[a-z]+")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+
+
+class TextStats(NamedTuple):
+    """Counts for one message. Every field is a plain sum, so totals are field-wise additions."""
+
+    messages: int
+    words: int
+    chars: int  # excluding spaces, as the Word Count tool has always reported
+    length: int  # every character, what platform limits count
+    sentences: int
+    syllables: int
+
+
+EMPTY = TextStats(0, 0, 0, 0, 0, 0)
+
+
+def _syllables(word: str) -> int:
+    count = len(_VOWEL_GROUP.findall(word))
+    if word.endswith("e") and not word.endswith("le") and count > 1:
+        count -= 1
+    return max(count, 1)
+
+
+def text_stats(text: str) -> TextStats:
+    """Computes the stats of one message; each message is scanned once, when it is added."""
+    words = len(text.split())
+    sentences = len(_SENTENCE_END.findall(text))
+    if words and not sentences:
+        sentences = 1
+    syllables = sum(_syllables(w) for w in _ALPHA_WORD.findall(text.lower()))
+    return TextStats(1, words, len(text) - text.count(" "), len(text), sentences, syllables)
+
+
+def fits(stats: TextStats) -> Dict[str, bool]:
+    """Whether a single message fits each format in FORMAT_LIMITS."""
+    return {name: (stats.length if unit == "chars" else stats.words) <= limit
+            for name, (unit, limit) in FORMAT_LIMITS.items()}
+
+
+def _add(a: TextStats, b: TextStats) -> TextStats:
+    return TextStats(*(x + y for x, y in zip(a, b)))
+
+
+def _sub(a: TextStats, b: TextStats) -> TextStats:
+    return TextStats(*(x - y for x, y in zip(a, b)))
+
+
+def summarize(stats: TextStats, fitting: Optional[Dict[str, int]] = None) -> dict:
+    """
+    Turns (aggregated) stats into the figures the app shows: reading time and the Flesch
+    readability scores, computed over the messages as if they were one text.
+    """
+    summary = stats._asdict()
+    summary["reading_minutes"] = stats.words / WORDS_PER_MINUTE
+    if stats.words and stats.sentences:
+        words_per_sentence = stats.words / stats.sentences
+        syllables_per_word = stats.syllables / stats.words
+        summary["reading_ease"] = 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+        summary["grade_level"] = 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59
+    else:
+        summary["reading_ease"] = summary["grade_level"] = None
+    if fitting is not None:
+        summary["fits"] = dict(fitting)
+    return summary
+
+
+class ContentAnalytics:
+    """
+    Running content stats for a chat, per role.
+    Register it on a MessageStore with `attach` and it is updated as messages are added, edited
+    or cleared; text messages are scanned once and every query is answered from running totals.
+    """
+
+    def __init__(self, msg_type: str = "text"):
+        self.msg_type = msg_type
+        self._stats = {}  # message position -> (role, TextStats)
+        self._totals = {}  # role -> TextStats
+        self._fitting = {}  # role -> {format: messages that fit}
+
+    @classmethod
+    def attach(cls, store: Any, msg_type: str = "text") -> "ContentAnalytics":
+        """Creates an instance for `store`, counting the messages already loaded."""
+        analytics = cls(msg_type)
+        for offset, msg in enumerate(store):
+            analytics.added(store.base + offset, msg)
+        store.listeners.append(analytics)
+        return analytics
+
+    def _count(self, role: str, stats: TextStats, sign: int):
+        self._totals[role] = (_add if sign > 0 else _sub)(self._totals.get(role, EMPTY), stats)
+        fitting = self._fitting.setdefault(role, dict.fromkeys(FORMAT_LIMITS, 0))
+        for name, ok in fits(stats).items():
+            fitting[name] += sign * ok
+
+    def added(self, idx: int, msg: Any):
+        if msg["type"] != self.msg_type or idx in self._stats:
+            return
+        stats = text_stats(msg["content"])
+        self._stats[idx] = (msg["role"], stats)
+        self._count(msg["role"], stats, 1)
+
+    def updated(self, idx: int, old_content: str, msg: Any):
+        entry = self._stats.pop(idx, None)
+        if entry is not None:
+            self._count(entry[0], entry[1], -1)
+        self.added(idx, msg)
+
+    def cleared(self):
+        self._stats.clear()
+        self._totals.clear()
+        self._fitting.clear()
+
+    def message(self, idx: int) -> Optional[dict]:
+        """Summary of the message at `idx`, including which formats it fits, or None if not counted."""
+        entry = self._stats.get(idx)
+        if entry is None:
+            return None
+        return summarize(entry[1], fits(entry[1]))
+
+    def totals(self, role: Optional[str] = None) -> TextStats:
+        if role is not None:
+            return self._totals.get(role, EMPTY)
+        total = EMPTY
+        for stats in self._totals.values():
+            total = _add(total, stats)
+        return total
+
+    def summary(self, role: Optional[str] = None) -> dict:
+        """
+        Aggregate figures for `role` (all roles if None); "fits" counts the messages that
+        individually fit each format.
+        """
+        roles = [role] if role is not None else list(self._fitting)
+        fitting = dict.fromkeys(FORMAT_LIMITS, 0)
+        for r in roles:
+            for name, n in self._fitting.get(r, {}).items():
+                fitting[name] += n
+        return summarize(self.totals(role), fitting)
+
+
+def analyze_messages(messages: Iterable[Any], msg_type: str = "text") -> ContentAnalytics:
+    """Batch path: stats for a whole history, e.g. every turn of a persisted session."""
+    analytics = ContentAnalytics(msg_type)
+    for idx, msg in enumerate(messages):
+        analytics.added(idx, msg)
+    return analytics
+
+
+def analyze_export(lines: Iterable[str]) -> ContentAnalytics:
+    """
+    Batch path over a JSONL export (utils.file_ops, fmt="jsonl"), e.g. an open file.
+    Image records carry no content and are skipped.
+    """
+    def records():
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                if "content" in record:
+                    yield {"role": record["role"], "content": record["content"], "type": record.get("type", "text")}
+
+    return analyze_messages(records())
@@ -0,0 +1,56 @@
+from typing import Any, List, Optional, Tuple
+
+HISTORY_PAGE_SIZE = 20
+
+# action key -> (button label, follow-up prompt sent to the model)
+MESSAGE_ACTIONS = {
+    "regen": ("🔄 Regenerate", "Regenerate this response:\n\n{content}"),
+    "expand": ("➕ Expand", "Expand this response with more detail:\n\n{content}"),
+    "shorten": ("➖ Shorten", "Shorten this response while keeping meaning clear:\n\n{content}"),
+}
+
+
+def message_html(role: str, content: str, ts: str = "") -> str:
+    """Returns the chat bubble markup used for a single message."""
+    role_class = "user-msg" if role == "user" else "assistant-msg"
+    meta = f"[{ts}] {role.capitalize()}" if ts else role.capitalize()
+    return f'<div class="{role_class}"><div class="msg-meta">{meta}</div><div class="msg-content">{content}</div></div>'
+
+
+def visible_window(messages: Any, limit: Optional[int], msg_type: str = "text") -> Tuple[int, List[Tuple[int, Any]]]:
+    """
+    Returns (hidden_count, [(index, message), ...]) for the newest `limit` messages of `msg_type`.
+    `messages` is a core.memory.MessageStore; indexes refer to positions in the full history.
+    `limit=None` shows everything. Only the visible tail is touched.
+    """
+    indexes = messages.indexes(msg_type)
+    hidden = 0
+    if limit is not None and len(indexes) > limit:
+        hidden = len(indexes) - limit
+        indexes = indexes[hidden:]
+    return hidden, [(idx, messages[idx]) for idx in indexes]
+
+
+def render_text_history(st: Any, messages: Any, limit: Optional[int] = HISTORY_PAGE_SIZE) -> Tuple[int, Optional[Tuple[str, int]]]:
+    """
+    Renders the visible tail of the text chat and its per-message action buttons.
+    Nothing is sent to the model here: the clicked button, if any, is returned as
+    (action, message_index) so the caller can build the request once, after rendering.
+    Returns (hidden_count, clicked_action).
+    """
+    hidden, window = visible_window(messages, limit)
+    clicked = None
+    for idx, msg in window:
+        st.markdown(message_html(msg["role"], msg["content"], msg.get("timestamp", "")), unsafe_allow_html=True)
+        if msg["role"] != "assistant":
+            continue
+        for col, (action, (label, _)) in zip(st.columns(len(MESSAGE_ACTIONS)), MESSAGE_ACTIONS.items()):
+            with col:
+                if st.button(label, key=f"{action}_{idx}"):
+                    clicked = (action, idx)
+    return hidden, clicked
+
+
+def action_prompt(action: str, content: str) -> str:
+    """Returns the follow-up prompt for a message action."""
+    return MESSAGE_ACTIONS[action][1].format(content=content)
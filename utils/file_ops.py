@@ -1,4 +1,93 @@
-import os
+import html
+import io
+import json
+from typing import Any, Iterable, Iterator
+
+from core.blobs import parse_image_keys
+
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "txt": ("txt", "text/plain"),
+    "md": ("md", "text/markdown"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "html": ("html", "text/html"),
+}
+
+
+def _rows(messages: Iterable[Any], images: str) -> Iterator[tuple]:
+    """
+    Yields (message, text, blob_keys) for export.
+    Image blobs are never inlined: with images="ref" they are written as a placeholder naming
+    the blob keys, with images="skip" they are left out.
+    """
+    for msg in messages:
+        blob_keys = parse_image_keys(msg["content"])
+        if not blob_keys:
+            yield msg, msg["content"], None
+        elif images == "ref":
+            label = "image" if len(blob_keys) == 1 else "images"
+            yield msg, f"[{label} {', '.join(blob_keys)}]", blob_keys
+
+
+def iter_export(messages: Iterable[Any], fmt: str = "txt", images: str = "ref") -> Iterator[str]:
+    """
+    Serializes chat history one message at a time.
+    messages: iterable of messages with keys [role, content, timestamp]
+    """
+    if fmt == "txt":
+        for msg, text, _ in _rows(messages, images):
+            yield f"[{msg['timestamp']}] {msg['role'].capitalize()}: {text}\n"
+    elif fmt == "md":
+        yield "# Chat History\n\n"
+        for msg, text, _ in _rows(messages, images):
+            role = "**User**" if msg["role"] == "user" else "**Assistant**"
+            yield f"- *{msg['timestamp']}* {role}: {text}\n"
+    elif fmt == "jsonl":
+        for msg, text, blob_keys in _rows(messages, images):
+            record = {"role": msg["role"], "timestamp": msg["timestamp"], "type": msg.get("type", "text")}
+            if blob_keys is None:
+                record["content"] = text
+            elif len(blob_keys) == 1:
+                record["image"] = blob_keys[0]
+            else:
+                record["images"] = blob_keys
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    elif fmt == "html":
+        yield '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Chat History</title></head><body>\n<h1>Chat History</h1>\n'
+        for msg, text, _ in _rows(messages, images):
+            yield (f'<div class="{html.escape(msg["role"])}"><p><small>[{msg["timestamp"]}] {msg["role"].capitalize()}</small></p>'
+                   f'<p>{html.escape(text)}</p></div>\n')
+        yield "</body></html>\n"
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_chat(messages: Iterable[Any], fmt: str = "txt", images: str = "ref") -> bytes:
+    """Returns the serialized history as UTF-8 bytes, built in memory."""
+    buf = io.StringIO()
+    for chunk in iter_export(messages, fmt, images):
+        buf.write(chunk)
+    return buf.getvalue().encode("utf-8")
+
+
+def get_cached_export(ss: Any, fmt: str = "txt", images: str = "ref") -> bytes:
+    """
+    Returns the export of the session's history, re-serializing only when the
+    message store version has changed since the last export in this format.
+    """
+    cache = ss.get("export_cache")
+    if cache is None:
+        cache = ss.export_cache = {}
+    store = ss.messages
+    store.load_all()  # a reopened session may still have older turns on disk
+    key = (fmt, images)
+    cached = cache.get(key)
+    if cached is not None and cached[0] is store and cached[1] == store.version:
+        return cached[2]
+    data = export_chat(store, fmt, images)
+    cache[key] = (store, store.version, data)
+    return data
+
 
 def export_chat_as_txt(messages, filename="chat_history.txt"):
     """
@@ -6,8 +95,7 @@ def export_chat_as_txt(messages, filename="chat_history.txt"):
     messages: list of dicts with keys [role, content, timestamp]
     """
     with open(filename, "w", encoding="utf-8") as f:
-        for msg in messages:
-            f.write(f"[{msg['timestamp']}] {msg['role'].capitalize()}: {msg['content']}\n")
+        f.writelines(iter_export(messages, "txt"))
     return filename
 
 
@@ -17,8 +105,5 @@ def export_chat_as_md(messages, filename="chat_history.md"):
     messages: list of dicts with keys [role, content, timestamp]
     """
     with open(filename, "w", encoding="utf-8") as f:
-        f.write("# Chat History\n\n")
-        for msg in messages:
-            role = "**User**" if msg["role"] == "user" else "**Assistant**"
-            f.write(f"- *{msg['timestamp']}* {role}: {msg['content']}\n")
+        f.writelines(iter_export(messages, "md"))
     return filename